@@ -0,0 +1,523 @@
+"""Offline load test for mayorbot.
+
+Drives the real command handlers (/submitvideo, /checkviews, /confirmverify), update_leaderboards, refresh_views
+and on_message through fake Discord objects against a local stub TikAPI/YouTube server, and reports throughput,
+p50/p99 latency and memory per scenario. Nothing talks to Discord, TikAPI or YouTube.
+
+    python bench.py                                   # 10k submissions, 500 concurrent commands
+    python bench.py --api-latency 200 --error-rate 0.05
+    python bench.py --json bench.json                 # save results...
+    python bench.py --baseline bench.json             # ...and fail (exit 1) if a later run regresses
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+
+import discord
+from aiohttp import web
+
+mayorbot = None  # Imported in main() once the environment below is configured
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline load test for mayorbot's command handlers.")
+    parser.add_argument("--submissions", type=int, default=10000, help="Tracked videos seeded before the run")
+    parser.add_argument("--users", type=int, default=2000, help="Users the seeded videos are spread across")
+    parser.add_argument("--guilds", type=int, default=20, help="Campaigns (each with its own leaderboard)")
+    parser.add_argument("--requests", type=int, default=500, help="Calls per command scenario")
+    parser.add_argument("--concurrency", type=int, default=500, help="Commands in flight at once")
+    parser.add_argument("--messages", type=int, default=5000, help="Messages fed to on_message")
+    parser.add_argument("--leaderboard-runs", type=int, default=5, help="update_leaderboards runs")
+    parser.add_argument("--api-latency", type=float, default=50, help="Mean stub TikAPI/YouTube latency (ms)")
+    parser.add_argument("--api-jitter", type=float, default=20, help="Std deviation of the stub latency (ms)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of stub requests answered with 500/429")
+    parser.add_argument("--discord-latency", type=float, default=20, help="Latency of each fake Discord API call (ms)")
+    parser.add_argument("--view-cache-ttl", type=float, default=0, help="VIEW_CACHE_TTL for the run (0 = always fetch)")
+    parser.add_argument("--scenarios", default="submitvideo,checkviews,confirmverify,update_leaderboards,refresh_views,on_message",
+                        help="Comma-separated scenarios to run, in order")
+    parser.add_argument("--no-tracemalloc", action="store_true", help="Skip allocation tracing (faster, RSS only)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--baseline", help="Results file from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed p99/throughput regression vs the baseline")
+    parser.add_argument("--verbose", action="store_true", help="Show the bot's INFO logs")
+    return parser.parse_args()
+
+
+def configure_environment(args, storage_dir):
+    """Settings the bot reads at import time; must run before bot.py is imported."""
+    os.environ["STORAGE_PATH"] = os.path.join(storage_dir, "bench.db")
+    os.environ["VIEW_CACHE_TTL"] = str(args.view_cache_ttl)
+    os.environ["BIO_CACHE_TTL"] = "0"
+    os.environ["HTTP_BACKOFF_BASE"] = "0.01"
+    os.environ["YOUTUBE_DAILY_QUOTA"] = "0"
+    os.environ["TIKAPI_RATE_LIMIT"] = "1000000"  # Measure the bot, not the production rate limit
+    os.environ["TIKAPI_BURST"] = "1000000"
+    os.environ["WORK_QUEUE_MAX_DEPTH"] = str(max(args.concurrency * 2, 500))
+    os.environ["METRICS_PORT"] = "0"
+
+
+# ✅ Stub TikAPI & YouTube Server
+class StubPlatform:
+    """Answers the TikAPI and YouTube endpoints the bot uses, with configurable latency and error rate."""
+
+    def __init__(self, latency, jitter, error_rate):
+        self.latency = latency / 1000
+        self.jitter = jitter / 1000
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self.runner = None
+        self.base_url = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/public/video", self.tiktok_video)
+        app.router.add_get("/public/check", self.tiktok_check)
+        app.router.add_get("/youtube/videos", self.youtube_videos)
+        app.router.add_get("/youtube/channels", self.youtube_channels)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = self.runner.addresses[0][:2]
+        self.base_url = f"http://{host}:{port}"
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+    async def respond(self, payload):
+        self.requests += 1
+        await asyncio.sleep(max(random.gauss(self.latency, self.jitter), 0))
+        if random.random() < self.error_rate:
+            self.errors += 1
+            if random.random() < 0.5:
+                return web.Response(status=429, headers={"Retry-After": "0.05"}, text="rate limited")
+            return web.Response(status=500, text="stub failure")
+        return web.json_response(payload)
+
+    async def tiktok_video(self, request):
+        video_id = int(request.query["id"])
+        return await self.respond({"data": {"video": {"stats": {"playCount": video_id % 100000 + int(time.time()) % 1000}}}})
+
+    async def tiktok_check(self, request):
+        user_id = request.query["username"].removeprefix("user")
+        return await self.respond({"userInfo": {"user": {"signature": f"clips daily | {user_id}-TIKTOK"}}})
+
+    async def youtube_videos(self, request):
+        ids = request.query["id"].split(",")
+        return await self.respond({"items": [{"id": video_id, "statistics": {"viewCount": str(len(video_id) * 1000)}} for video_id in ids]})
+
+    async def youtube_channels(self, request):
+        user_id = request.query["forUsername"].removeprefix("user")
+        return await self.respond({"items": [{"snippet": {"description": f"my channel {user_id}-YOUTUBE"}}]})
+
+
+# ✅ Fake Discord Objects
+class FakeDiscord:
+    """Just enough of Discord for the handlers: guilds, channels and messages, each API call taking `latency` seconds."""
+
+    def __init__(self, latency):
+        self.latency = latency / 1000
+        self.guilds = {}
+        self.channels = {}
+        self.message_ids = itertools.count(10**15)
+        self.calls = 0
+
+    async def api_call(self):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def add_guild(self, guild_id):
+        guild = types.SimpleNamespace(id=guild_id, name=f"Campaign {guild_id}", roles=[types.SimpleNamespace(name="Verified", id=1)])
+        self.guilds[guild_id] = guild
+        return guild
+
+    def add_channel(self, channel_id, name):
+        self.channels[channel_id] = FakeChannel(self, channel_id, name)
+        return self.channels[channel_id]
+
+
+class FakeMessage:
+    def __init__(self, discord_backend, channel, content, author=None):
+        self.discord = discord_backend
+        self.id = next(discord_backend.message_ids)
+        self.channel = channel
+        self.content = content
+        self.author = author
+
+    async def edit(self, content=None):
+        await self.discord.api_call()
+        self.content = content
+        return self
+
+    async def pin(self):
+        await self.discord.api_call()
+
+    async def delete(self):
+        await self.discord.api_call()
+        self.channel.messages.pop(self.id, None)
+
+
+class FakeChannel:
+    def __init__(self, discord_backend, channel_id, name):
+        self.discord = discord_backend
+        self.id = channel_id
+        self.name = name
+        self.messages = {}
+        self.deleted = 0
+
+    async def send(self, content=None, **kwargs):
+        await self.discord.api_call()
+        message = FakeMessage(self.discord, self, content)
+        self.messages[message.id] = message
+        return message
+
+    def get_partial_message(self, message_id):
+        return self.messages.get(message_id) or FakeMessage(self.discord, self, None)
+
+    async def purge(self):
+        await self.discord.api_call()
+        self.messages.clear()
+
+    async def delete_messages(self, messages):
+        await self.discord.api_call()
+        self.deleted += len(messages)
+
+
+class FakeMember:
+    def __init__(self, discord_backend, user_id):
+        self.discord = discord_backend
+        self.id = user_id
+        self.name = f"user{user_id}"
+        self.mention = f"<@{user_id}>"
+        self.bot = False
+        self.guild_permissions = discord.Permissions.none()
+        self.roles = []
+
+    async def add_roles(self, *roles):
+        await self.discord.api_call()
+        self.roles.extend(roles)
+
+    async def send(self, content=None, **kwargs):
+        await self.discord.api_call()
+
+
+class FakeInteraction:
+    """A slash-command interaction whose `replied` future resolves with the user's final reply."""
+
+    def __init__(self, discord_backend, command, user, guild, channel):
+        self.discord = discord_backend
+        self.command = types.SimpleNamespace(qualified_name=command)
+        self.user = user
+        self.guild = guild
+        self.guild_id = guild.id
+        self.channel = channel
+        self.created_at = discord.utils.utcnow()
+        self.extras = {}
+        self.replied = asyncio.get_running_loop().create_future()
+        self.deferred = False
+        self.response = types.SimpleNamespace(send_message=self.send_message, defer=self.defer, is_done=lambda: self.deferred)
+        self.followup = types.SimpleNamespace(send=self.send_followup)
+
+    def reply(self, content):
+        if not self.replied.done():
+            self.replied.set_result(content or "")
+
+    async def send_message(self, content=None, **kwargs):
+        await self.discord.api_call()
+        self.deferred = True
+        self.reply(content)
+
+    async def defer(self, **kwargs):
+        await self.discord.api_call()
+        self.deferred = True
+
+    async def send_followup(self, content=None, **kwargs):
+        await self.discord.api_call()
+        self.reply(content)
+
+
+# ✅ Scenarios
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def is_failure(reply):
+    return reply.startswith(("❌", "⚠️", "⏳"))
+
+
+class Bench:
+    """Seeds the bot's state, wires it to the fakes and runs each scenario under measurement."""
+
+    def __init__(self, args):
+        self.args = args
+        self.discord = FakeDiscord(args.discord_latency)
+        self.platform = StubPlatform(args.api_latency, args.api_jitter, args.error_rate)
+        self.members = {}
+        self.video_ids = itertools.count(10**9)
+        self.results = []
+
+    def member(self, user_id):
+        if user_id not in self.members:
+            self.members[user_id] = FakeMember(self.discord, user_id)
+        return self.members[user_id]
+
+    async def setup(self):
+        await self.platform.start()
+        mayorbot.TIKAPI_BASE_URL = self.platform.base_url
+        mayorbot.youtube_client.base_url = f"{self.platform.base_url}/youtube"
+
+        bot = mayorbot.bot
+        bot.get_guild = self.discord.guilds.get
+        bot.get_channel = self.discord.channels.get
+
+        mayorbot.CAMPAIGN_LEADERBOARD_CHANNELS.clear()
+        for index in range(self.args.guilds):
+            guild = self.discord.add_guild(1000 + index)
+            self.discord.add_channel(2000 + index, f"leaderboard-{index}")
+            mayorbot.CAMPAIGN_LEADERBOARD_CHANNELS[guild.id] = 2000 + index
+        mayorbot.GLOBAL_LEADERBOARD_CHANNEL_ID = 2000  # Shares a channel with the first campaign, as in production
+        self.verify_channel = self.discord.add_channel(3000, "get-verified")
+        mayorbot.WATCHED_CHANNEL_IDS = frozenset({self.verify_channel.id})
+
+        state = await mayorbot.storage.open()
+        assert not state["submissions"], "bench storage should start empty"
+        await mayorbot.platform_client.start()
+        await mayorbot.start_metrics()
+        mayorbot.work_queue.start()
+
+        started = time.perf_counter()
+        now = time.time()
+        for index in range(self.args.submissions):
+            self.add_submission(random.randrange(self.args.users), now - random.uniform(0, 30 * 86400))
+        await mayorbot.storage.set_meta("submission_id", mayorbot.bot.video_submissions.next_id)  # /submitvideo allocates after these
+        print(f"🌱 Seeded {self.args.submissions} submission(s) across {self.args.users} user(s) "
+              f"and {self.args.guilds} campaign(s) in {time.perf_counter() - started:.2f}s")
+
+    def add_submission(self, user_id, submitted_at):
+        platform, url = self.new_video()
+        guild = self.discord.guilds[1000 + user_id % self.args.guilds]
+        views = random.randrange(1_000_000)
+        submission = mayorbot.bot.video_submissions.add(mayorbot.Submission(
+            user_id=user_id, server_id=guild.id, server_name=guild.name, platform=platform,
+            video_id=mayorbot.normalize_video_id(platform, url), video_url=url, submitted_at=submitted_at,
+            initial_views=views, latest_views=views, last_polled=submitted_at,
+        ))
+        mayorbot.record_history(submission, views, submitted_at)
+
+    def new_video(self):
+        number = next(self.video_ids)
+        if number % 2:
+            return "tiktok", f"https://www.tiktok.com/@user/video/{number}"
+        return "youtube", f"https://www.youtube.com/watch?v=yt{number % 10**9:09d}"
+
+    def interaction(self, command, user_id, channel=None):
+        guild = self.discord.guilds[1000 + user_id % self.args.guilds]
+        return FakeInteraction(self.discord, command, self.member(user_id), guild, channel or self.verify_channel)
+
+    async def measure(self, name, calls, concurrency):
+        """Runs the calls (coroutine functions returning a reply) at most `concurrency` at a time."""
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+        failures = 0
+        api_requests, discord_calls = self.platform.requests, self.discord.calls
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+            traced_before = tracemalloc.get_traced_memory()[0]
+
+        async def timed(call):
+            nonlocal failures
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    reply = await call()
+                    failures += is_failure(reply)
+                except Exception as e:
+                    failures += 1
+                    logging.getLogger("bench").error(f"{name} call raised {type(e).__name__}: {e}")
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(timed(call) for call in calls))
+        wall = time.perf_counter() - started
+
+        result = {
+            "scenario": name,
+            "calls": len(latencies),
+            "failures": failures,
+            "seconds": round(wall, 3),
+            "throughput": round(len(latencies) / wall, 1) if wall else 0.0,
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+            "api_requests": self.platform.requests - api_requests,
+            "discord_calls": self.discord.calls - discord_calls,
+        }
+        if tracemalloc.is_tracing():
+            traced_after, peak = tracemalloc.get_traced_memory()
+            result["mem_delta_kb"] = round((traced_after - traced_before) / 1024, 1)
+            result["mem_peak_kb"] = round((peak - traced_before) / 1024, 1)
+        self.results.append(result)
+        print_result(result)
+        return result
+
+    async def command(self, interaction, callback, *args):
+        await callback(interaction, *args)
+        return await asyncio.wait_for(interaction.replied, 60)
+
+    async def scenario_submitvideo(self):
+        def call(user_id):
+            platform, url = self.new_video()
+            return self.command(self.interaction("submitvideo", user_id), mayorbot.submitvideo.callback, platform, url)
+        users = [random.randrange(self.args.users) for _ in range(self.args.requests)]
+        await self.measure("submitvideo", [lambda u=u: call(u) for u in users], self.args.concurrency)
+
+    async def scenario_checkviews(self):
+        users = [user_id for user_id in mayorbot.bot.video_submissions.by_user if mayorbot.bot.video_submissions.by_user[user_id]]
+        picks = [random.choice(users) for _ in range(self.args.requests)]
+        await self.measure("checkviews", [
+            lambda u=u: self.command(self.interaction("checkviews", u), mayorbot.checkviews.callback) for u in picks
+        ], self.args.concurrency)
+
+    async def scenario_confirmverify(self):
+        def call(user_id):
+            platform = random.choice(("tiktok", "youtube"))
+            mayorbot.bot.pending_verifications[user_id] = {
+                "platform": platform, "username": f"user{user_id}", "code": f"{user_id}-{platform.upper()}",
+            }
+            interaction = self.interaction("confirmverify", user_id)
+            return self.command(interaction, mayorbot.confirmverify.callback, platform, f"user{user_id}")
+        users = random.sample(range(self.args.users), min(self.args.requests, self.args.users))
+        await self.measure("confirmverify", [lambda u=u: call(u) for u in users], self.args.concurrency)
+
+    async def scenario_update_leaderboards(self):
+        async def run():
+            # Move some videos up the rankings so boards really re-render and edit
+            for video in random.sample(list(mayorbot.bot.video_submissions), min(200, len(mayorbot.bot.video_submissions))):
+                mayorbot.record_views(video, video.latest_views + random.randrange(1, 500_000))
+            await mayorbot.update_leaderboards()
+            return ""
+        await self.measure("update_leaderboards", [run] * self.args.leaderboard_runs, 1)
+
+    async def scenario_refresh_views(self):
+        async def run():
+            return f"{await mayorbot.refresh_views(force=True)}"
+        await self.measure("refresh_views", [run], 1)
+
+    async def scenario_on_message(self):
+        def message(index):
+            author = self.member(index % self.args.users)
+            channel = self.verify_channel if index % 2 else self.discord.channels[2000]
+            content = "/verify tiktok me" if index % 10 == 0 else f"hello {index}"
+            return FakeMessage(self.discord, channel, content, author)
+
+        async def call(msg):
+            await mayorbot.on_message(msg)
+            return ""
+
+        messages = [message(index) for index in range(self.args.messages)]
+        await self.measure("on_message", [lambda m=m: call(m) for m in messages], self.args.concurrency)
+        started = time.perf_counter()
+        await mayorbot.moderation.flush()
+        print(f"   ↳ moderation flush: {self.verify_channel.deleted} message(s) bulk-deleted and {mayorbot.moderation.warnings} warning(s) sent "
+              f"in {time.perf_counter() - started:.3f}s ({len(mayorbot.moderation.to_warn)} warning(s) left for later flushes)")
+
+    async def teardown(self):
+        await mayorbot.work_queue.stop()
+        await mayorbot.stop_metrics()
+        await mayorbot.platform_client.close()
+        await mayorbot.storage.close()
+        await self.platform.stop()
+
+
+def print_result(result):
+    memory = f" - mem {result['mem_delta_kb']:+}KB (peak {result['mem_peak_kb']:+}KB)" if "mem_delta_kb" in result else ""
+    print(
+        f"📊 {result['scenario']:<20} {result['calls']:>6} call(s) in {result['seconds']:>7.3f}s - "
+        f"{result['throughput']:>8.1f}/s - p50 {result['p50_ms']:>8.2f}ms - p99 {result['p99_ms']:>8.2f}ms - "
+        f"{result['failures']} failed - {result['api_requests']} API / {result['discord_calls']} Discord call(s){memory}"
+    )
+
+
+def compare_to_baseline(results, baseline_path, tolerance):
+    """Returns the regressions (p99 up or throughput down by more than `tolerance`) against a saved run."""
+    with open(baseline_path) as f:
+        baseline = {result["scenario"]: result for result in json.load(f)["results"]}
+    regressions = []
+    for result in results:
+        before = baseline.get(result["scenario"])
+        if not before:
+            continue
+        if before["p99_ms"] and result["p99_ms"] > before["p99_ms"] * (1 + tolerance):
+            regressions.append(f"{result['scenario']}: p99 {before['p99_ms']}ms -> {result['p99_ms']}ms")
+        if before["throughput"] and result["throughput"] < before["throughput"] * (1 - tolerance):
+            regressions.append(f"{result['scenario']}: throughput {before['throughput']}/s -> {result['throughput']}/s")
+    return regressions
+
+
+async def run(args):
+    bench = Bench(args)
+    async with mayorbot.bot:  # Binds the client to this loop without logging in
+        await bench.setup()
+        try:
+            for name in args.scenarios.split(","):
+                scenario = getattr(bench, f"scenario_{name.strip()}", None)
+                if scenario is None:
+                    raise SystemExit(f"Unknown scenario: {name}")
+                await scenario()
+        finally:
+            await bench.teardown()
+
+    lag = mayorbot.metrics.histograms.get(("mayorbot_event_loop_lag_seconds", ()))
+    if lag:
+        print(f"⏱️ Event-loop lag: p50 {lag.quantile(0.5) * 1000:.0f}ms, p99 {lag.quantile(0.99) * 1000:.0f}ms, max {lag.max * 1000:.0f}ms")
+    print(f"🌐 Stub platform: {bench.platform.requests} request(s), {bench.platform.errors} injected error(s)")
+    return bench.results
+
+
+def main():
+    args = parse_args()
+    random.seed(args.seed)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format="%(levelname)s %(name)s: %(message)s")
+
+    with tempfile.TemporaryDirectory(prefix="mayorbot-bench-") as storage_dir:
+        configure_environment(args, storage_dir)
+        global mayorbot
+        import bot as mayorbot
+
+        if not args.no_tracemalloc:
+            tracemalloc.start()
+        results = asyncio.run(run(args))
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux reports KB
+    print(f"💾 Peak RSS: {peak_rss:.0f}MB")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "peak_rss_mb": round(peak_rss, 1), "results": results}, f, indent=2)
+
+    if args.baseline:
+        regressions = compare_to_baseline(results, args.baseline, args.tolerance)
+        for regression in regressions:
+            print(f"🚨 Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        print("✅ No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
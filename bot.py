@@ -2,9 +2,29 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 import os
-import requests
+import io
+import sys
+import re
+import csv
+import time
+import json
+import random
+import socket
+import hashlib
+import logging
+import sqlite3
+import asyncio
+import threading
+import aiohttp
+import heapq
+from aiohttp import web
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter, OrderedDict, deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse, parse_qs
 from dotenv import load_dotenv
-from googleapiclient.discovery import build
 
 # Load environment variables
 load_dotenv()
@@ -12,6 +32,1448 @@ TOKEN = os.getenv("DISCORD_BOT_TOKEN")
 TIKAPI_KEY = os.getenv("TIKAPI_KEY")
 YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
 
+# Platform API settings (base URLs can point at a local stub server for testing)
+TIKAPI_BASE_URL = os.getenv("TIKAPI_BASE_URL", "https://api.tikapi.io")
+YOUTUBE_API_BASE_URL = os.getenv("YOUTUBE_API_BASE_URL", "https://www.googleapis.com/youtube/v3")
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))  # Seconds per request
+HTTP_MAX_CONCURRENCY = int(os.getenv("HTTP_MAX_CONCURRENCY", "20"))  # Max in-flight platform requests
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))  # Retries for 429s, 5xx, timeouts and connection errors
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))  # First retry delay; doubles on each attempt
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "30"))  # Longest we'll wait, including Retry-After
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))  # Consecutive failures before failing fast
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "60"))  # Seconds before a probe request is let through
+YOUTUBE_DAILY_QUOTA = int(os.getenv("YOUTUBE_DAILY_QUOTA", "10000"))  # YouTube Data API units per day (0 = unlimited)
+TIKAPI_DAILY_QUOTA = int(os.getenv("TIKAPI_DAILY_QUOTA", "0"))  # TikAPI credits per day (0 = unlimited)
+BACKGROUND_QUOTA_SHARE = float(os.getenv("BACKGROUND_QUOTA_SHARE", "0.8"))  # Background polling stops at this share of the quota
+YOUTUBE_BATCH_SIZE = 50  # videos.list accepts up to 50 IDs per request
+DISCORD_MESSAGE_LIMIT = 2000  # Characters per Discord message
+LOOKUP_CACHE_SIZE = int(os.getenv("LOOKUP_CACHE_SIZE", "10000"))  # Max cached entries per lookup cache
+VIEW_CACHE_TTL = float(os.getenv("VIEW_CACHE_TTL", "60"))  # Seconds a fetched view count is reused
+BIO_CACHE_TTL = float(os.getenv("BIO_CACHE_TTL", "10"))  # Kept short so /confirmverify sees a freshly edited bio
+
+# Persistent storage settings
+STORAGE_PATH = os.getenv("STORAGE_PATH", "mayorbot.db")  # SQLite database file
+STORAGE_FLUSH_INTERVAL = float(os.getenv("STORAGE_FLUSH_INTERVAL", "2"))  # Seconds between batched write commits
+
+# Sharding & multi-process coordination (every process must share STORAGE_PATH)
+SHARD_COUNT = os.getenv("SHARD_COUNT", "")  # Total shards across all processes ("auto" = Discord's recommendation, empty = unsharded)
+SHARD_IDS = [int(shard_id) for shard_id in os.getenv("SHARD_IDS", "").split(",") if shard_id.strip()]  # Shards this process runs (empty = all)
+SYNC_INTERVAL = float(os.getenv("SYNC_INTERVAL", "2"))  # Seconds between reads of other processes' writes
+LEASE_TTL = float(os.getenv("LEASE_TTL", "30"))  # A leader that stops renewing for this long is replaced
+LEASE_RENEW_INTERVAL = float(os.getenv("LEASE_RENEW_INTERVAL", "10"))
+SYNC_COMMANDS = os.getenv("SYNC_COMMANDS", "auto")  # "auto" syncs slash commands only when they changed, or "always" / "never"
+
+# Background job intervals (seconds)
+LEADERBOARD_INTERVAL = int(os.getenv("LEADERBOARD_INTERVAL", "3600"))
+CLEANUP_INTERVAL = int(os.getenv("CLEANUP_INTERVAL", "3600"))
+JOB_JITTER = float(os.getenv("JOB_JITTER", "0.1"))  # Each run is delayed by up to ±10% of its interval
+
+# Slow-command work queue
+WORK_QUEUE_WORKERS = int(os.getenv("WORK_QUEUE_WORKERS", "8"))  # Platform lookups processed at once
+WORK_QUEUE_MAX_DEPTH = int(os.getenv("WORK_QUEUE_MAX_DEPTH", "500"))  # Beyond this, commands are told to retry
+
+# Logging, metrics & profiling
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()  # DEBUG also logs every individual lookup
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # "json" writes one JSON object per line for log shippers
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # Serves /metrics (Prometheus text) and /profile (0 = disabled)
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "1"))  # Seconds between event-loop lag probes
+PROFILER_INTERVAL = float(os.getenv("PROFILER_INTERVAL", "0.01"))  # Seconds between stack samples while profiling
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "0") == "1"  # Start sampling at boot; /stats can also toggle it
+PROFILER_MAX_DEPTH = 40  # Frames kept per sampled stack
+
+
+# ✅ Logging & Metrics
+log = logging.getLogger("mayorbot")
+
+
+class JsonLogFormatter(logging.Formatter):
+    """One JSON object per log record, for log shippers (LOG_FORMAT=json)."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)  # Seconds
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (Prometheus "le" buckets) with a bucket-resolution quantile estimate."""
+
+    __slots__ = ("buckets", "counts", "count", "sum", "max")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation (capped at the largest value seen)."""
+        if not self.count:
+            return 0.0
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= q * self.count:
+                return min(bound, self.max)
+        return self.max
+
+
+def prometheus_labels(labels):
+    """Formats ((name, value), ...) as {name="value",...}, escaping values as the text format requires."""
+    if not labels:
+        return ""
+    pairs = []
+    for name, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class MetricsRegistry:
+    """Counters, gauges and histograms keyed by (name, labels), rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self.counters = {}  # (name, labels) -> value
+        self.gauges = {}
+        self.histograms = {}  # (name, labels) -> Histogram
+        self.help = {}  # name -> (type, help text)
+        self.collectors = []  # Functions that refresh gauges just before they are read
+
+    def describe(self, name, kind, text):
+        self.help[name] = (kind, text)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(value)
+
+    def collector(self, func):
+        self.collectors.append(func)
+        return func
+
+    def collect(self):
+        for func in self.collectors:
+            func()
+
+    def series(self, table, name):
+        """Yields (labels dict, value) for every series of one metric."""
+        for (metric, labels), value in table.items():
+            if metric == name:
+                yield dict(labels), value
+
+    def render(self):
+        self.collect()
+        families = {}
+        for (name, labels), value in [*self.counters.items(), *self.gauges.items()]:
+            families.setdefault(name, []).append(f"{name}{prometheus_labels(labels)} {value}")
+        for (name, labels), histogram in self.histograms.items():
+            samples = families.setdefault(name, [])
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + (None,), histogram.counts):
+                cumulative += count
+                le = "+Inf" if bound is None else repr(bound)
+                samples.append(f"{name}_bucket{prometheus_labels(labels + (('le', le),))} {cumulative}")
+            samples.append(f"{name}_sum{prometheus_labels(labels)} {histogram.sum}")
+            samples.append(f"{name}_count{prometheus_labels(labels)} {histogram.count}")
+
+        lines = []
+        for name in sorted(families):
+            kind, text = self.help.get(name, ("untyped", name))
+            lines += [f"# HELP {name} {text}", f"# TYPE {name} {kind}", *families[name]]
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+metrics.describe("mayorbot_command_seconds", "histogram", "Slash command latency from interaction to final reply, including queued work")
+metrics.describe("mayorbot_command_errors_total", "counter", "Slash commands that raised")
+metrics.describe("mayorbot_provider_requests_total", "counter", "Platform API requests by provider and HTTP status (0 = connection error)")
+metrics.describe("mayorbot_provider_request_seconds", "histogram", "Platform API request latency")
+metrics.describe("mayorbot_provider_retries_total", "counter", "Platform API requests retried after a transient failure")
+metrics.describe("mayorbot_provider_rejected_total", "counter", "Platform API requests refused locally by the circuit breaker or quota")
+metrics.describe("mayorbot_provider_circuit_open", "gauge", "1 while a provider's circuit breaker is not closed")
+metrics.describe("mayorbot_provider_quota_used", "gauge", "Quota units spent today")
+metrics.describe("mayorbot_cache_hits_total", "counter", "Lookup cache hits (including coalesced in-flight fetches)")
+metrics.describe("mayorbot_cache_misses_total", "counter", "Lookup cache misses")
+metrics.describe("mayorbot_cache_hit_ratio", "gauge", "Lookup cache hit ratio since startup")
+metrics.describe("mayorbot_cache_entries", "gauge", "Entries held by a lookup cache")
+metrics.describe("mayorbot_event_loop_lag_seconds", "histogram", "How late the event loop woke a sleeping probe task")
+metrics.describe("mayorbot_leaderboard_publish_seconds", "histogram", "Time to render and publish one leaderboard")
+metrics.describe("mayorbot_work_queue_depth", "gauge", "Jobs waiting on the slow-command work queue")
+metrics.describe("mayorbot_job_last_duration_seconds", "gauge", "Duration of a scheduled job's most recent run")
+metrics.describe("mayorbot_job_failures_total", "counter", "Failed scheduled job runs")
+
+
+def observe_command(interaction, failed=False):
+    """Records a slash command's latency as the user saw it: from the interaction's creation to now."""
+    command = interaction.command.qualified_name if interaction.command else "unknown"
+    latency = (discord.utils.utcnow() - interaction.created_at).total_seconds()
+    metrics.observe("mayorbot_command_seconds", max(latency, 0.0), command=command)
+    if failed:
+        metrics.inc("mayorbot_command_errors_total", command=command)
+
+
+async def monitor_event_loop(interval=LOOP_LAG_INTERVAL):
+    """Measures how late the loop wakes a sleeping task; sustained lag means something is blocking the loop."""
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        metrics.observe("mayorbot_event_loop_lag_seconds", max(time.perf_counter() - started - interval, 0.0))
+
+
+class SamplingProfiler:
+    """Samples the event-loop thread's call stack from a daemon thread; cheap enough to switch on in production."""
+
+    def __init__(self, interval=PROFILER_INTERVAL):
+        self.interval = interval
+        self.thread_id = None
+        self.thread = None
+        self.stopped = threading.Event()
+        self.lock = threading.Lock()
+        self.stacks = Counter()  # "outer;...;inner" -> samples
+        self.samples = 0
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        """Starts sampling the calling thread (call it from the event loop)."""
+        if self.running:
+            return
+        self.thread_id = threading.get_ident()
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self.thread.start()
+        log.info(f"🔬 Sampling profiler started ({self.interval * 1000:.0f}ms interval)")
+
+    def stop(self):
+        self.stopped.set()
+        self.thread = None
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and len(stack) < PROFILER_MAX_DEPTH:
+                stack.append(f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}")
+                frame = frame.f_back
+            if stack:
+                with self.lock:
+                    self.stacks[";".join(reversed(stack))] += 1
+                    self.samples += 1
+
+    def collapsed(self):
+        """All samples in the collapsed-stack format that flamegraph.pl and speedscope read."""
+        with self.lock:
+            return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def hottest(self, n=5):
+        """The functions most often on top of the stack, as (function, share of samples)."""
+        leaves = Counter()
+        with self.lock:
+            for stack, count in self.stacks.items():
+                leaves[stack.rsplit(";", 1)[-1]] += count
+            total = self.samples
+        return [(function, count / total) for function, count in leaves.most_common(n)]
+
+
+profiler = SamplingProfiler()
+
+
+async def serve_metrics(request):
+    return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8")
+
+async def serve_profile(request):
+    if not profiler.samples:
+        return web.Response(status=404, text="Profiler has no samples; set PROFILER_ENABLED=1 or use /stats profiling:start\n")
+    return web.Response(text=profiler.collapsed(), content_type="text/plain", charset="utf-8")
+
+async def start_metrics():
+    """Starts the event-loop lag probe, the /metrics endpoint (if METRICS_PORT is set) and, optionally, the profiler."""
+    bot.metrics_tasks = [asyncio.create_task(monitor_event_loop(), name="metrics:loop_lag")]
+    bot.metrics_runner = None
+    if METRICS_PORT:
+        app = web.Application()
+        app.router.add_get("/metrics", serve_metrics)
+        app.router.add_get("/profile", serve_profile)
+        bot.metrics_runner = web.AppRunner(app, access_log=None)
+        await bot.metrics_runner.setup()
+        await web.TCPSite(bot.metrics_runner, METRICS_HOST, METRICS_PORT).start()
+        log.info(f"📈 Serving metrics on http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+    if PROFILER_ENABLED:
+        profiler.start()
+
+async def stop_metrics():
+    profiler.stop()
+    for task in getattr(bot, "metrics_tasks", []):
+        task.cancel()
+    await asyncio.gather(*getattr(bot, "metrics_tasks", []), return_exceptions=True)
+    if getattr(bot, "metrics_runner", None):
+        await bot.metrics_runner.cleanup()
+
+
+# ✅ Shared Async HTTP Client for TikAPI & YouTube
+class PlatformError(Exception):
+    """Raised when a platform API request fails or returns a non-200 response."""
+
+    def __init__(self, status, message, retry_after=None):
+        super().__init__(f"{status} - {message}")
+        self.status = status
+        self.message = message
+        self.retry_after = retry_after  # Seconds the provider asked us to wait, if it said
+
+    @property
+    def retryable(self):
+        """Rate limits, server errors, timeouts (408) and connection failures (0) are worth retrying."""
+        return self.status in (0, 408, 429) or self.status >= 500
+
+
+class CircuitOpenError(PlatformError):
+    """Raised without making a request while a provider's circuit breaker is open."""
+
+
+class QuotaExceededError(PlatformError):
+    """Raised without making a request when a provider's daily quota (or the background share of it) is used up."""
+
+
+def parse_retry_after(value):
+    """Retry-After is either a number of seconds or an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures so an outage fails fast, then lets a single probe through after a cool-down.
+    A probe that never reports back (cancelled, or crashed outside PlatformError) doesn't wedge it: after another
+    cool-down the next caller becomes the probe."""
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def allow(self):
+        if self.state == "closed":
+            return True
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = "half_open"  # This caller is the probe; everyone else keeps failing fast
+            self.opened_at = time.monotonic()
+            return True
+        return False
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                log.warning(f"🔌 Circuit opened after {self.failures} consecutive failure(s)")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+
+class QuotaBudget:
+    """A provider's daily request budget; background work may only use BACKGROUND_QUOTA_SHARE of it."""
+
+    def __init__(self, daily_limit, background_share=BACKGROUND_QUOTA_SHARE):
+        self.daily_limit = daily_limit
+        self.background_share = background_share
+        self.day = None
+        self.used = 0
+
+    def try_spend(self, cost, background=False):
+        today = datetime.now(timezone.utc).date()  # Budgets roll over at midnight UTC
+        if today != self.day:
+            self.day = today
+            self.used = 0
+        if self.daily_limit:
+            limit = self.daily_limit * (self.background_share if background else 1)
+            if self.used + cost > limit:
+                return False
+        self.used += cost
+        return True
+
+
+class PlatformClient:
+    """One pooled, keep-alive aiohttp session shared by every command, with bounded concurrency,
+    retries, and a circuit breaker and daily quota per provider."""
+
+    def __init__(self, timeout=HTTP_TIMEOUT, max_concurrency=HTTP_MAX_CONCURRENCY, max_retries=HTTP_MAX_RETRIES, quotas=None):
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.session = None
+        self.breakers = {provider: CircuitBreaker() for provider in (quotas or {})}
+        self.budgets = {provider: QuotaBudget(limit) for provider, limit in (quotas or {}).items()}
+
+    async def start(self):
+        """Opens the shared session (safe to call more than once)."""
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=60, ttl_dns_cache=300)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    async def _get_once(self, url, params, headers, timeout, provider):
+        await self.start()
+        request_timeout = aiohttp.ClientTimeout(total=timeout) if timeout else self.timeout
+        async with self.semaphore:
+            started = time.perf_counter()
+            status = 200
+            try:
+                async with self.session.get(url, params=params, headers=headers, timeout=request_timeout) as response:
+                    if response.status != 200:
+                        status = response.status
+                        raise PlatformError(
+                            response.status, await response.text(), parse_retry_after(response.headers.get("Retry-After"))
+                        )
+                    try:
+                        return await response.json(content_type=None)
+                    except ValueError as e:  # e.g. an HTML error page served with a 200
+                        status = 502
+                        raise PlatformError(502, f"Invalid JSON in response: {e}")
+            except asyncio.TimeoutError:
+                status = 408
+                raise PlatformError(408, f"Request timed out after {request_timeout.total}s")
+            except aiohttp.ClientError as e:
+                status = 0
+                raise PlatformError(0, str(e))
+            finally:
+                provider = provider or "other"
+                metrics.inc("mayorbot_provider_requests_total", provider=provider, status=status)
+                metrics.observe("mayorbot_provider_request_seconds", time.perf_counter() - started, provider=provider)
+
+    async def get_json(self, url, params=None, headers=None, timeout=None, provider=None, cost=1, background=False):
+        """GETs a JSON document, retrying transient failures with exponential backoff (honoring Retry-After).
+        Raises PlatformError once retries run out, or straight away for client errors, an open circuit or a spent quota."""
+        breaker = self.breakers.get(provider)
+        budget = self.budgets.get(provider)
+        attempt = 0
+        while True:
+            if breaker and not breaker.allow():
+                metrics.inc("mayorbot_provider_rejected_total", provider=provider, reason="circuit_open")
+                raise CircuitOpenError(503, f"{provider} is unavailable (circuit open)")
+            if budget and not budget.try_spend(cost, background):
+                metrics.inc("mayorbot_provider_rejected_total", provider=provider, reason="quota")
+                raise QuotaExceededError(429, f"{provider} {'background ' if background else ''}daily quota used up")
+
+            try:
+                data = await self._get_once(url, params, headers, timeout, provider)
+            except PlatformError as e:
+                if breaker and e.retryable:
+                    breaker.record_failure()
+                elif breaker:
+                    breaker.record_success()  # A 4xx means the provider is up and answering
+                if not e.retryable or attempt >= self.max_retries:
+                    raise
+                delay = e.retry_after if e.retry_after is not None else HTTP_BACKOFF_BASE * 2 ** attempt * random.uniform(0.5, 1)
+                if delay > HTTP_BACKOFF_MAX:
+                    raise
+                attempt += 1
+                metrics.inc("mayorbot_provider_retries_total", provider=provider or "other")
+                log.warning(f"🔁 {provider or url} request failed ({e.status}); retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                if breaker and breaker.state == "half_open":
+                    breaker.record_failure()  # The probe died without an answer; reopen rather than stay half-open
+                raise
+
+            if breaker:
+                breaker.record_success()
+            return data
+
+
+platform_client = PlatformClient(quotas={"tiktok": TIKAPI_DAILY_QUOTA, "youtube": YOUTUBE_DAILY_QUOTA})
+
+
+# ✅ Long-lived YouTube Data API Client
+class YouTubeClient:
+    """YouTube Data API v3 client built once at startup, reusing the shared HTTP session."""
+
+    def __init__(self, http, api_key, base_url=YOUTUBE_API_BASE_URL):
+        self.http = http
+        self.api_key = api_key
+        self.base_url = base_url
+
+    async def get_channel_description(self, username):
+        """Returns the channel description for a legacy username, or None if no channel matches."""
+        params = {"part": "snippet", "forUsername": username, "key": self.api_key}
+        response = await self.http.get_json(f"{self.base_url}/channels", params=params, provider="youtube")
+        items = response.get("items") or []
+        if not items:
+            return None
+        return items[0]["snippet"].get("description", "")
+
+    async def get_video_views(self, video_ids, background=False):
+        """Returns {video_id: view_count} using batched videos.list calls (up to 50 IDs, 1 quota unit each)."""
+        video_ids = list(dict.fromkeys(video_ids))  # De-duplicate, keep order
+        batches = [video_ids[i:i + YOUTUBE_BATCH_SIZE] for i in range(0, len(video_ids), YOUTUBE_BATCH_SIZE)]
+        responses = await asyncio.gather(*(
+            self.http.get_json(
+                f"{self.base_url}/videos",
+                params={"part": "statistics", "id": ",".join(batch), "key": self.api_key},
+                provider="youtube",
+                background=background,
+            )
+            for batch in batches
+        ))
+
+        views = {}
+        for response in responses:
+            for item in response.get("items", []):
+                views[item["id"]] = int(item.get("statistics", {}).get("viewCount", 0))
+        return views
+
+
+youtube_client = YouTubeClient(platform_client, YOUTUBE_API_KEY)
+
+
+YOUTUBE_VIDEO_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{11}$")
+
+def extract_youtube_video_id(video_url):
+    """Extracts the video ID from watch, youtu.be, shorts, embed and live URLs (or a bare ID)."""
+    video_url = video_url.strip()
+    if YOUTUBE_VIDEO_ID_PATTERN.match(video_url):
+        return video_url
+
+    parsed = urlparse(video_url if "://" in video_url else f"https://{video_url}")
+    host = parsed.netloc.lower().split(":")[0]
+    for prefix in ("www.", "m.", "music."):
+        host = host.removeprefix(prefix)
+    path_parts = [part for part in parsed.path.split("/") if part]
+
+    video_id = None
+    if host == "youtu.be" and path_parts:
+        video_id = path_parts[0]
+    elif host in ("youtube.com", "youtube-nocookie.com"):
+        if parsed.path.rstrip("/") == "/watch":
+            video_id = parse_qs(parsed.query).get("v", [None])[0]
+        elif len(path_parts) >= 2 and path_parts[0] in ("shorts", "embed", "live", "v"):
+            video_id = path_parts[1]
+
+    if video_id and YOUTUBE_VIDEO_ID_PATTERN.match(video_id):
+        return video_id
+    return None
+
+# ✅ Platform Lookup Cache
+class TTLCache:
+    """Bounded LRU cache with per-entry expiry that coalesces concurrent misses into one fetch (single-flight)."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires_at, value), least recently used first
+        self.inflight = {}  # key -> task fetching that key
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def set(self, key, value):
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, key):
+        self.entries.pop(key, None)
+
+    def purge_expired(self):
+        """Drops expired entries so they don't hold memory until evicted; returns how many were removed."""
+        now = time.monotonic()
+        expired = [key for key, (expires_at, _) in self.entries.items() if expires_at <= now]
+        for key in expired:
+            del self.entries[key]
+        return len(expired)
+
+    async def get_or_fetch(self, key, fetch):
+        """Returns the cached value for `key`, or awaits `fetch()` (shared with any concurrent caller)."""
+        entry = self.entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self.entries[key]
+
+        task = self.inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(fetch())
+            self.inflight[key] = task
+            task.add_done_callback(lambda done, key=key: self._finish(key, done))
+        else:
+            self.coalesced += 1
+
+        # Shielded so one caller timing out doesn't cancel the fetch for everyone else
+        return await asyncio.shield(task)
+
+    async def get_or_fetch_many(self, keys, fetch_many):
+        """get_or_fetch for several keys: cached and in-flight keys are shared, the rest go to one `fetch_many(missing)` call.
+        fetch_many returns {key: value or exception} for every key it was given; this returns the same shape."""
+        results, waiting, missing = {}, {}, []
+        now = time.monotonic()
+        for key in dict.fromkeys(keys):
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                results[key] = entry[1]
+            elif key in self.inflight:
+                self.coalesced += 1
+                waiting[key] = self.inflight[key]
+            else:
+                self.entries.pop(key, None)
+                missing.append(key)
+
+        if missing:
+            self.misses += len(missing)
+            batch = asyncio.ensure_future(fetch_many(missing))
+            for key in missing:
+                task = asyncio.ensure_future(self._pick(batch, key))  # Per key, so single lookups can join in
+                self.inflight[key] = task
+                task.add_done_callback(lambda done, key=key: self._finish(key, done))
+                waiting[key] = task
+
+        for key, task in waiting.items():
+            try:
+                results[key] = await asyncio.shield(task)
+            except Exception as e:
+                results[key] = e
+        return results
+
+    @staticmethod
+    async def _pick(batch, key):
+        value = (await batch)[key]
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    def _finish(self, key, task):
+        self.inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is None:  # Errors are never cached
+            self.set(key, task.result())
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
+
+
+view_cache = TTLCache(LOOKUP_CACHE_SIZE, VIEW_CACHE_TTL)  # ("tiktok"/"youtube", video_id) -> views
+bio_cache = TTLCache(LOOKUP_CACHE_SIZE, BIO_CACHE_TTL)  # ("tiktok"/"youtube", username) -> bio
+
+
+# ✅ Persistent Storage (SQLite, WAL mode)
+# Each entry migrates the schema one version forward; PRAGMA user_version records how many have run.
+SCHEMA_MIGRATIONS = [
+    """
+    CREATE TABLE video_submissions (
+        user_id INTEGER PRIMARY KEY,
+        server_id INTEGER NOT NULL,
+        server_name TEXT NOT NULL,
+        platform TEXT NOT NULL,
+        video_url TEXT NOT NULL,
+        submitted_at REAL NOT NULL,
+        initial_views INTEGER NOT NULL DEFAULT 0,
+        latest_views INTEGER NOT NULL DEFAULT 0,
+        views_per_hour REAL NOT NULL DEFAULT 0,
+        last_polled REAL
+    );
+    CREATE INDEX idx_video_submissions_server_id ON video_submissions (server_id);
+    CREATE INDEX idx_video_submissions_platform ON video_submissions (platform);
+
+    CREATE TABLE pending_verifications (
+        user_id INTEGER PRIMARY KEY,
+        platform TEXT NOT NULL,
+        username TEXT NOT NULL,
+        code TEXT NOT NULL
+    );
+    CREATE INDEX idx_pending_verifications_platform ON pending_verifications (platform);
+
+    CREATE TABLE pending_payouts (
+        user_id INTEGER PRIMARY KEY,
+        guild_id INTEGER,
+        username TEXT NOT NULL,
+        campaign TEXT NOT NULL,
+        views INTEGER NOT NULL,
+        amount REAL NOT NULL,
+        status TEXT NOT NULL,
+        channel_id INTEGER
+    );
+    CREATE INDEX idx_pending_payouts_guild_id ON pending_payouts (guild_id);
+    """,
+    # Many submissions per user: rows get their own ID, video_id is backfilled on the next load
+    """
+    CREATE TABLE submissions (
+        submission_id INTEGER PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        server_id INTEGER NOT NULL,
+        server_name TEXT NOT NULL,
+        platform TEXT NOT NULL,
+        video_id TEXT,
+        video_url TEXT NOT NULL,
+        submitted_at REAL NOT NULL,
+        initial_views INTEGER NOT NULL DEFAULT 0,
+        latest_views INTEGER NOT NULL DEFAULT 0,
+        views_per_hour REAL NOT NULL DEFAULT 0,
+        last_polled REAL
+    );
+    INSERT INTO submissions (
+        user_id, server_id, server_name, platform, video_url, submitted_at,
+        initial_views, latest_views, views_per_hour, last_polled
+    )
+    SELECT
+        user_id, server_id, server_name, lower(platform), video_url, submitted_at,
+        initial_views, latest_views, views_per_hour, last_polled
+    FROM video_submissions;
+    DROP TABLE video_submissions;
+    CREATE INDEX idx_submissions_user_id ON submissions (user_id);
+    CREATE INDEX idx_submissions_server_id ON submissions (server_id);
+    CREATE INDEX idx_submissions_platform_video_id ON submissions (platform, video_id);
+    """,
+    # Edit-in-place leaderboards: the message(s) currently showing each board
+    """
+    CREATE TABLE leaderboard_messages (
+        board TEXT PRIMARY KEY,
+        channel_id INTEGER NOT NULL,
+        message_ids TEXT NOT NULL,
+        content_hash TEXT NOT NULL
+    );
+    """,
+    # View-count time series: one row per video, timestamps and counts packed as two binary columns
+    """
+    CREATE TABLE view_history (
+        submission_id INTEGER PRIMARY KEY,
+        times BLOB NOT NULL,
+        views BLOB NOT NULL
+    );
+    """,
+    # Several shard processes share this file: every write batch stamps its rows with the next global version so
+    # other processes can read just what changed since they last looked; deletions leave a versioned tombstone.
+    """
+    ALTER TABLE submissions ADD COLUMN version INTEGER NOT NULL DEFAULT 0;
+    ALTER TABLE pending_verifications ADD COLUMN version INTEGER NOT NULL DEFAULT 0;
+    ALTER TABLE pending_payouts ADD COLUMN version INTEGER NOT NULL DEFAULT 0;
+    ALTER TABLE view_history ADD COLUMN version INTEGER NOT NULL DEFAULT 0;
+    CREATE INDEX idx_submissions_version ON submissions (version);
+    CREATE INDEX idx_pending_verifications_version ON pending_verifications (version);
+    CREATE INDEX idx_pending_payouts_version ON pending_payouts (version);
+    CREATE INDEX idx_view_history_version ON view_history (version);
+
+    CREATE TABLE job_triggers (
+        name TEXT PRIMARY KEY,
+        requested_at REAL NOT NULL,
+        version INTEGER NOT NULL DEFAULT 0
+    );
+
+    CREATE TABLE deletions (
+        tbl TEXT NOT NULL,
+        key NOT NULL,
+        version INTEGER NOT NULL,
+        deleted_at REAL NOT NULL,
+        PRIMARY KEY (tbl, key)
+    );
+    CREATE INDEX idx_deletions_version ON deletions (version);
+
+    CREATE TABLE meta (
+        name TEXT PRIMARY KEY,
+        value
+    );
+    INSERT INTO meta (name, value) VALUES ('version', 0);
+    INSERT INTO meta (name, value) SELECT 'submission_id', coalesce(max(submission_id), 0) FROM submissions;
+
+    CREATE TABLE leases (
+        name TEXT PRIMARY KEY,
+        holder TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    );
+    """,
+]
+
+# Table -> (key column, value columns). Value columns match the keys of the in-memory dicts.
+STORAGE_TABLES = {
+    "submissions": ("submission_id", (
+        "user_id", "server_id", "server_name", "platform", "video_id", "video_url", "submitted_at",
+        "initial_views", "latest_views", "views_per_hour", "last_polled",
+    )),
+    "pending_verifications": ("user_id", ("platform", "username", "code")),
+    "pending_payouts": ("user_id", ("guild_id", "username", "campaign", "views", "amount", "status", "channel_id")),
+    "leaderboard_messages": ("board", ("channel_id", "message_ids", "content_hash")),
+    "view_history": ("submission_id", ("times", "views")),
+    "job_triggers": ("name", ("requested_at",)),
+}
+# Tables whose writes other shard processes pick up; leaderboard messages belong to the leader alone
+SYNCED_TABLES = ("submissions", "pending_verifications", "pending_payouts", "view_history", "job_triggers")
+
+
+class Storage:
+    """SQLite persistence with write-behind batching: commands queue writes, a background task commits them off the event loop."""
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = None
+        self.lock = threading.Lock()  # sqlite3 connections must not be used from two threads at once
+        self.pending = {}  # (table, key) -> row tuple, or None to delete; newer writes replace older ones
+        self.flushing = {}  # The batch being committed right now, until its transaction has committed
+        self.mergers = {}  # Table -> func(stored_row, new_row) for tables every process appends to; the rest are last-writer-wins
+        self.flush_task = None
+        self.flush_lock = asyncio.Lock()
+        self.synced_version = 0  # Every write at or below this version is already in memory
+        self.own_versions = set()  # Versions this process wrote, so sync doesn't re-apply them
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout = 10000")  # Other shard processes may hold the write lock briefly
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # Safe with WAL, far fewer fsyncs
+        while True:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version >= len(SCHEMA_MIGRATIONS):
+                break
+            try:
+                conn.executescript(f"BEGIN IMMEDIATE; {SCHEMA_MIGRATIONS[version]}; PRAGMA user_version = {version + 1}; COMMIT;")
+            except sqlite3.OperationalError:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                if conn.execute("PRAGMA user_version").fetchone()[0] == version:
+                    raise
+                # Another process applied this migration while we waited for the lock; carry on from its version
+        self.conn = conn
+
+    def _load_all(self):
+        """Reads every table in one query each, returning {table: {key: dict}}, and the version that state is at."""
+        state = {}
+        with self.lock:
+            self.conn.execute("BEGIN")  # One snapshot, so the version matches the rows
+            try:
+                for table in STORAGE_TABLES:
+                    state[table] = self._select_table(table)
+                self.synced_version = self.conn.execute("SELECT value FROM meta WHERE name = 'version'").fetchone()[0]
+            finally:
+                self.conn.execute("COMMIT")
+        return state
+
+    def _select_table(self, table):
+        key_column, columns = STORAGE_TABLES[table]
+        rows = self.conn.execute(f"SELECT {key_column}, {', '.join(columns)} FROM {table}").fetchall()
+        return {row[0]: dict(zip(columns, row[1:])) for row in rows}
+
+    def _load_table(self, table):
+        with self.lock:
+            return self._select_table(table)
+
+    async def load_table(self, table):
+        """Re-reads one whole table as {key: dict}, e.g. an unsynced table another process owned until now."""
+        await self.flush()  # So the rows read back include this process's own queued writes
+        return await asyncio.to_thread(self._load_table, table)
+
+    def _write(self, batch):
+        upserts, deletes = {}, {}
+        for (table, key), row in batch.items():
+            if row is None:
+                deletes.setdefault(table, []).append((key,))
+            else:
+                upserts.setdefault(table, []).append((key, *row))
+
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")  # Take the write lock up front; batches from all processes commit in version order
+            try:
+                version = self.conn.execute("UPDATE meta SET value = value + 1 WHERE name = 'version' RETURNING value").fetchall()[0][0]
+                for table, rows in upserts.items():
+                    key_column, columns = STORAGE_TABLES[table]
+                    if table in self.mergers:
+                        rows = self._merge_stored(table, rows)
+                    if table in SYNCED_TABLES:
+                        columns = (*columns, "version")
+                        rows = [(*row, version) for row in rows]
+                    placeholders = ", ".join("?" * (len(columns) + 1))
+                    self.conn.executemany(
+                        f"INSERT OR REPLACE INTO {table} ({key_column}, {', '.join(columns)}) VALUES ({placeholders})",
+                        rows,
+                    )
+                for table, keys in deletes.items():
+                    key_column, _ = STORAGE_TABLES[table]
+                    self.conn.executemany(f"DELETE FROM {table} WHERE {key_column} = ?", keys)
+                    if table in SYNCED_TABLES:
+                        self.conn.executemany(
+                            "INSERT OR REPLACE INTO deletions (tbl, key, version, deleted_at) VALUES (?, ?, ?, ?)",
+                            [(table, key, version, time.time()) for (key,) in keys],
+                        )
+                self.conn.execute("COMMIT")
+                self.own_versions.add(version)
+                self.flushing = {}  # Cleared under the lock, so sync never sees this batch as both in flight and committed
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def _merge_stored(self, table, rows):
+        """Folds each stored row into the one being written, so a process doesn't overwrite samples another process added."""
+        key_column, columns = STORAGE_TABLES[table]
+        merge = self.mergers[table]
+        stored = {}
+        keys = [row[0] for row in rows]
+        for start in range(0, len(keys), 500):  # Stay under SQLite's bound-parameter limit
+            chunk = keys[start:start + 500]
+            for key, *values in self.conn.execute(
+                f"SELECT {key_column}, {', '.join(columns)} FROM {table} WHERE {key_column} IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            ):
+                stored[key] = tuple(values)
+        return [(row[0], *merge(stored[row[0]], row[1:])) if row[0] in stored else row for row in rows]
+
+    def _read_changes(self):
+        """Rows other processes wrote since the last sync: ({table: {key: dict}}, {table: [deleted keys]})."""
+        changes, deletions = {}, {}
+        with self.lock:
+            self.conn.execute("BEGIN")
+            try:
+                since = self.synced_version
+                latest = self.conn.execute("SELECT value FROM meta WHERE name = 'version'").fetchone()[0]
+                if latest > since:
+                    for table in SYNCED_TABLES:
+                        key_column, columns = STORAGE_TABLES[table]
+                        rows = self.conn.execute(
+                            f"SELECT {key_column}, version, {', '.join(columns)} FROM {table} WHERE version > ? AND version <= ?",
+                            (since, latest),
+                        ).fetchall()
+                        changes[table] = {
+                            row[0]: dict(zip(columns, row[2:])) for row in rows if row[1] not in self.own_versions
+                        }
+                    for table, key, version in self.conn.execute(
+                        "SELECT tbl, key, version FROM deletions WHERE version > ? AND version <= ?", (since, latest)
+                    ):
+                        if version not in self.own_versions:
+                            deletions.setdefault(table, []).append(key)
+            finally:
+                self.conn.execute("COMMIT")
+            self.synced_version = latest
+            self.own_versions = {version for version in self.own_versions if version > latest}
+            # Checked under the lock: a batch in flight now commits after this read, so its rows are the newer ones
+            self._drop_locally_written(changes, deletions, self.flushing)
+        return changes, deletions
+
+    def _drop_locally_written(self, changes, deletions, written):
+        """Drops remote rows for keys this process has a newer write for; merged tables are combined instead."""
+        for table, rows in changes.items():
+            if table not in self.mergers:
+                for key in [key for key in rows if (table, key) in self.pending or (table, key) in written]:
+                    del rows[key]
+        for table, keys in deletions.items():
+            deletions[table] = [key for key in keys if (table, key) not in self.pending and (table, key) not in written]
+
+    async def read_changes(self):
+        changes, deletions = await asyncio.to_thread(self._read_changes)
+        self._drop_locally_written(changes, deletions, {})  # Writes queued while the read ran are newer too
+        return changes, deletions
+
+    def _next_id(self, name):
+        with self.lock:
+            return self.conn.execute("UPDATE meta SET value = value + 1 WHERE name = ? RETURNING value", (name,)).fetchall()[0][0]
+
+    async def next_id(self, name):
+        """Allocates an ID no other shard process will hand out (e.g. the next submission_id)."""
+        return await asyncio.to_thread(self._next_id, name)
+
+    def _get_meta(self, name):
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    async def get_meta(self, name):
+        return await asyncio.to_thread(self._get_meta, name)
+
+    def _set_meta(self, name, value):
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, value))
+
+    async def set_meta(self, name, value):
+        await asyncio.to_thread(self._set_meta, name, value)
+
+    def _acquire_lease(self, name, holder, ttl):
+        now = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute(
+                    "INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT (name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at "
+                    "WHERE leases.holder = excluded.holder OR leases.expires_at < ?",
+                    (name, holder, now + ttl, now),
+                )
+                current = self.conn.execute("SELECT holder FROM leases WHERE name = ?", (name,)).fetchone()[0]
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        return current == holder
+
+    async def acquire_lease(self, name, holder, ttl):
+        """Takes or renews a named lease; returns True while `holder` owns it. A lease nobody renews expires after `ttl`."""
+        return await asyncio.to_thread(self._acquire_lease, name, holder, ttl)
+
+    def _release_lease(self, name, holder):
+        with self.lock:
+            self.conn.execute("DELETE FROM leases WHERE name = ? AND holder = ?", (name, holder))
+
+    async def release_lease(self, name, holder):
+        await asyncio.to_thread(self._release_lease, name, holder)
+
+    def _prune_deletions(self, before):
+        with self.lock:
+            return self.conn.execute("DELETE FROM deletions WHERE deleted_at < ?", (before,)).rowcount
+
+    async def prune_deletions(self, before):
+        """Drops tombstones older than `before`; running processes synced past them long ago and new ones load full state."""
+        return await asyncio.to_thread(self._prune_deletions, before)
+
+    async def open(self):
+        """Opens the database, applies migrations and loads all state in one pass."""
+        await asyncio.to_thread(self._open)
+        state = await asyncio.to_thread(self._load_all)
+        self.flush_task = asyncio.create_task(self._flush_loop())
+        return state
+
+    def upsert(self, table, key, record):
+        """Queues a row write; the record dict is snapshotted now so later mutations don't race the flush."""
+        _, columns = STORAGE_TABLES[table]
+        self.pending[(table, key)] = tuple(record.get(column) for column in columns)
+
+    def delete(self, table, key):
+        self.pending[(table, key)] = None
+
+    async def flush(self):
+        """Commits every queued write in a single transaction on a worker thread."""
+        async with self.flush_lock:  # One batch in flight at a time
+            if not self.pending or self.conn is None:
+                return
+            batch = self.flushing = self.pending  # Set before pending is swapped, so sync always sees these keys in one or the other
+            self.pending = {}
+            write = asyncio.ensure_future(asyncio.to_thread(self._write, batch))
+            try:
+                await asyncio.shield(write)  # Cancelling a flush (e.g. at shutdown) mustn't abandon a batch mid-write
+            except asyncio.CancelledError:
+                await asyncio.wait([write])  # Let it land or fail first, so close() flushes whatever is really left
+                raise
+            except Exception:
+                pass  # Handled below
+            finally:
+                if write.done() and write.exception() is not None:
+                    log.error(f"❌ Storage flush failed, will retry: {write.exception()}")
+                    for item, row in batch.items():
+                        self.pending.setdefault(item, row)  # Don't clobber writes queued since
+                    self.flushing = {}
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(STORAGE_FLUSH_INTERVAL)
+            await self.flush()
+
+    async def close(self):
+        if self.flush_task:
+            self.flush_task.cancel()
+            await asyncio.gather(self.flush_task, return_exceptions=True)  # Wait out a write already in progress
+        await self.flush()
+        if self.conn is not None:
+            with self.lock:  # No worker thread is mid-query when the connection goes away
+                self.conn.close()
+                self.conn = None
+
+
+storage = Storage(STORAGE_PATH)
+
+
+# ✅ Periodic Job Scheduler
+class Job:
+    """A periodic background job with jitter, a no-overlap guarantee and per-run metrics.
+    Leader-only jobs are skipped in every shard process except the elected leader."""
+
+    def __init__(self, name, func, interval, jitter=JOB_JITTER, leader_only=False, wait_for_ready=True):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.leader_only = leader_only
+        self.wait_for_ready = wait_for_ready
+        self.lock = asyncio.Lock()
+        self.wakeup = asyncio.Event()
+        self.task = None
+        self.runs = 0
+        self.failures = 0
+        self.last_started = None
+        self.last_duration = None
+        self.last_error = None
+        self.next_run = None
+
+    @property
+    def running(self):
+        return self.lock.locked()
+
+    async def run_once(self):
+        """Runs the job now unless a run is already in progress; returns False if skipped."""
+        if self.lock.locked():
+            return False
+        async with self.lock:
+            self.last_started = time.time()
+            started = time.perf_counter()
+            try:
+                await self.func()
+                self.last_error = None
+            except Exception as e:
+                self.failures += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                log.error(f"❌ Job '{self.name}' failed: {self.last_error}", exc_info=e)
+            finally:
+                self.runs += 1
+                self.last_duration = time.perf_counter() - started
+        return True
+
+    def trigger(self):
+        """Requests a run as soon as possible without waiting for it; returns True if one is already running."""
+        self.wakeup.set()
+        return self.running
+
+    async def loop(self):
+        if self.wait_for_ready:
+            await bot.wait_until_ready()
+        while True:
+            self.wakeup.clear()  # A trigger during the run below schedules one more run straight after it
+            if not self.leader_only or (bot.is_leader and time.time() < bot.lease_expires):
+                await self.run_once()
+            delay = self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+            self.next_run = time.time() + delay
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+
+class Scheduler:
+    """Owns every periodic job and its background task."""
+
+    def __init__(self):
+        self.jobs = {}
+
+    def add(self, name, func, interval, jitter=JOB_JITTER, leader_only=False, wait_for_ready=True):
+        self.jobs[name] = Job(name, func, interval, jitter, leader_only, wait_for_ready)
+        return self.jobs[name]
+
+    def start(self):
+        for job in self.jobs.values():
+            if job.task is None:
+                job.task = asyncio.create_task(job.loop(), name=f"job:{job.name}")
+
+    async def stop(self):
+        tasks = [job.task for job in self.jobs.values() if job.task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for job in self.jobs.values():
+            job.task = None
+
+    def trigger(self, name):
+        return self.jobs[name].trigger()
+
+
+scheduler = Scheduler()
+
+
+# ✅ Background Work Queue for Slow Commands
+class WorkQueue:
+    """Bounded queue drained by a fixed pool of workers, with depth and wait-time metrics."""
+
+    def __init__(self, workers, max_depth):
+        self.workers = workers
+        self.queue = asyncio.Queue(max_depth)
+        self.tasks = []
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.waits = deque(maxlen=1000)  # Seconds recent jobs spent queued before a worker picked them up
+
+    def start(self):
+        while len(self.tasks) < self.workers:
+            self.tasks.append(asyncio.create_task(self._worker(), name=f"worker:{len(self.tasks)}"))
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    def submit(self, job):
+        """Queues a coroutine function; returns False (backpressure) when the queue is full."""
+        try:
+            self.queue.put_nowait((time.perf_counter(), job))
+            return True
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+
+    async def _worker(self):
+        while True:
+            enqueued_at, job = await self.queue.get()
+            self.waits.append(time.perf_counter() - enqueued_at)
+            try:
+                await job()
+            except Exception as e:
+                self.failed += 1
+                log.error(f"❌ Background job failed: {type(e).__name__}: {e}", exc_info=e)
+            finally:
+                self.processed += 1
+                self.queue.task_done()
+
+    def stats(self):
+        waits = sorted(self.waits)
+        return {
+            "depth": self.queue.qsize(),
+            "max_depth": self.queue.maxsize,
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "wait_avg": sum(waits) / len(waits) if waits else 0.0,
+            "wait_p95": waits[int(len(waits) * 0.95)] if waits else 0.0,
+        }
+
+
+work_queue = WorkQueue(WORK_QUEUE_WORKERS, WORK_QUEUE_MAX_DEPTH)
+
+
+async def defer_to_queue(interaction, work):
+    """Acknowledges the interaction straight away, then runs `work` (which replies via followups) on the work queue."""
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    interaction.extras["queued"] = True  # Latency is recorded when the queued work finishes, not on completion
+
+    async def job():
+        try:
+            await work()
+        except Exception:
+            observe_command(interaction, failed=True)
+            await interaction.followup.send("❌ Something went wrong while processing your request. Please try again.", ephemeral=True)
+            raise
+        observe_command(interaction)
+
+    if not work_queue.submit(job):
+        observe_command(interaction, failed=True)
+        await interaction.followup.send("⏳ The bot is busy right now. Please try again in a minute.", ephemeral=True)
+
+
+# ✅ Submission Data Model
+LEADERBOARD_TRACKED = 100  # Entries each board keeps in rank order; only these cost more than a dict write to update
+
+
+class Leaderboard:
+    """Submissions ranked by views, keeping only the top `capacity` in sorted order so an update is O(1) for everything below the cut-off.
+    Updates inside the top cost O(capacity); when an entry drops out of it, the top is rebuilt in O(N) on the next read."""
+
+    def __init__(self, capacity=LEADERBOARD_TRACKED):
+        self.capacity = capacity
+        self.ranking = []  # Sorted (-views, submission_id) keys of the top `capacity`, most views first
+        self.keys = {}  # submission_id -> its current key, for every submission on the board
+        self.stale = False  # The top lost an entry that some submission outside it should replace
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _discard(self, key):
+        index = bisect_left(self.ranking, key)
+        if index < len(self.ranking) and self.ranking[index] == key:
+            del self.ranking[index]
+            return True
+        return False
+
+    def update(self, submission_id, views):
+        key = (-views, submission_id)
+        old_key = self.keys.get(submission_id)
+        if old_key == key:
+            return
+        self.keys[submission_id] = key
+        if self.stale:
+            return  # The next read rebuilds the top from self.keys
+        cutoff = self.ranking[-1] if len(self.ranking) == self.capacity else None  # Everything outside ranks below it
+        if old_key is not None and self._discard(old_key):
+            if cutoff is None or key < cutoff:
+                insort(self.ranking, key)
+            else:
+                self.stale = True  # Fell out of the top; the best of the rest isn't known without a scan
+        elif cutoff is None:
+            insort(self.ranking, key)  # Fewer than `capacity` submissions, so every one is ranked
+        elif key < cutoff:
+            insort(self.ranking, key)
+            self.ranking.pop()
+
+    def remove(self, submission_id):
+        old_key = self.keys.pop(submission_id, None)
+        if old_key is not None and self._discard(old_key) and len(self.keys) > len(self.ranking):
+            self.stale = True
+
+    def top(self, k):
+        """Returns the IDs of the top K submissions, most views first."""
+        if k > self.capacity:
+            return [submission_id for _, submission_id in heapq.nsmallest(k, self.keys.values())]
+        if self.stale:
+            self.ranking = heapq.nsmallest(self.capacity, self.keys.values())
+            self.stale = False
+        return [submission_id for _, submission_id in self.ranking[:k]]
+
+
+class Submission:
+    """One tracked video. __slots__ keeps each record compact when tracking hundreds of thousands of videos."""
+
+    __slots__ = (
+        "submission_id", "user_id", "server_id", "server_name", "platform", "video_id", "video_url",
+        "submitted_at", "initial_views", "latest_views", "views_per_hour", "last_polled",
+    )
+
+    def __init__(self, submission_id=None, user_id=0, server_id=0, server_name="", platform="", video_id=None,
+                 video_url="", submitted_at=0.0, initial_views=0, latest_views=0, views_per_hour=0.0, last_polled=None):
+        self.submission_id = submission_id
+        self.user_id = user_id
+        self.server_id = server_id  # Campaign (guild) ID
+        self.server_name = server_name  # Campaign name
+        self.platform = platform
+        self.video_id = video_id  # Normalized platform video ID
+        self.video_url = video_url
+        self.submitted_at = submitted_at
+        self.initial_views = initial_views
+        self.latest_views = latest_views
+        self.views_per_hour = views_per_hour
+        self.last_polled = last_polled
+
+    def get(self, field, default=None):
+        """Dict-style access so Storage can snapshot a submission like any other row."""
+        return getattr(self, field, default)
+
+
+class SubmissionStore:
+    """All tracked videos by submission ID, with secondary indexes by guild, by user and by normalized video ID."""
+
+    def __init__(self):
+        self.by_id = {}
+        self.by_guild = {}  # server_id -> {submission_id: Submission}
+        self.by_user = {}  # user_id -> {submission_id: Submission}
+        self.by_video = {}  # (platform, video_id) -> Submission
+        self.global_board = Leaderboard()
+        self.guild_boards = {}  # server_id -> Leaderboard
+        self.next_id = 1
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def __iter__(self):
+        return iter(self.by_id.values())
+
+    def add(self, submission):
+        """Indexes a submission, assigning it the next free ID if it doesn't have one yet."""
+        if submission.submission_id is None:
+            submission.submission_id = self.next_id
+        self.next_id = max(self.next_id, submission.submission_id + 1)
+
+        self.by_id[submission.submission_id] = submission
+        self.by_guild.setdefault(submission.server_id, {})[submission.submission_id] = submission
+        self.by_user.setdefault(submission.user_id, {})[submission.submission_id] = submission
+        if submission.video_id:
+            self.by_video.setdefault((submission.platform, submission.video_id), submission)
+        self.rerank(submission)
+        return submission
+
+    def rerank(self, submission):
+        """Moves a submission to its new place in the campaign and global rankings after its views change."""
+        self.global_board.update(submission.submission_id, submission.latest_views)
+        self.guild_boards.setdefault(submission.server_id, Leaderboard()).update(
+            submission.submission_id, submission.latest_views
+        )
+
+    def remove(self, submission_id):
+        submission = self.by_id.pop(submission_id, None)
+        if submission is None:
+            return None
+        self.by_guild.get(submission.server_id, {}).pop(submission_id, None)
+        self.by_user.get(submission.user_id, {}).pop(submission_id, None)
+        if self.by_video.get((submission.platform, submission.video_id)) is submission:
+            del self.by_video[(submission.platform, submission.video_id)]
+        self.global_board.remove(submission_id)
+        if submission.server_id in self.guild_boards:
+            self.guild_boards[submission.server_id].remove(submission_id)
+        return submission
+
+    def find_video(self, platform, video_id):
+        return self.by_video.get((platform, video_id))
+
+    def for_guild(self, guild_id):
+        return self.by_guild.get(guild_id, {}).values()
+
+    def for_user(self, user_id, guild_id=None):
+        videos = self.by_user.get(user_id, {}).values()
+        if guild_id is None:
+            return list(videos)
+        return [video for video in videos if video.server_id == guild_id]
+
+    def top(self, k, guild_id=None):
+        """Returns the K most-viewed submissions in a campaign, or across all campaigns if guild_id is None."""
+        board = self.global_board if guild_id is None else self.guild_boards.get(guild_id)
+        if board is None:
+            return []
+        return [self.by_id[submission_id] for submission_id in board.top(k)]
+
+
+def normalize_video_id(platform, video_url):
+    """Returns the platform's canonical video ID for a URL, so different link shapes map to one video."""
+    if platform == "tiktok":
+        return extract_tiktok_video_id(video_url)
+    if platform == "youtube":
+        return extract_youtube_video_id(video_url)
+    return None
+
+
 # Set up bot
 intents = discord.Intents.default()
 intents.messages = True
@@ -19,43 +1481,237 @@ intents.guilds = True
 intents.message_content = True
 intents.members = True  # Required for role assignments
 
-bot = commands.Bot(command_prefix="/", intents=intents)
+if SHARD_COUNT == "auto" and SHARD_IDS:
+    # Each process would ask Discord for its own recommendation, so processes could disagree on the total
+    sys.exit("❌ SHARD_IDS needs a numeric SHARD_COUNT (the total across all processes), not \"auto\".")
+
+if SHARD_COUNT:
+    # One process can run every shard, or several processes each run a slice (SHARD_IDS) against the same STORAGE_PATH
+    bot = commands.AutoShardedBot(
+        command_prefix="/",
+        intents=intents,
+        shard_count=None if SHARD_COUNT == "auto" else int(SHARD_COUNT),
+        shard_ids=SHARD_IDS or None,
+    )
+else:
+    bot = commands.Bot(command_prefix="/", intents=intents)
+
+# In-memory state, loaded from storage in setup_hook
+bot.pending_verifications = {}
+bot.video_submissions = SubmissionStore()
+bot.pending_payouts = {}
+bot.leaderboard_messages = {}  # Board key -> {"channel_id", "message_ids" (JSON list), "content_hash"}
+bot.view_history = {}  # Submission ID -> ViewHistory
+bot.is_leader = False  # Whether this process holds the leader lease and runs the leader-only jobs
+bot.lease_expires = 0.0  # When our lease lapses unless renewed; past it another process may already lead
+bot.instance_id = f"{socket.gethostname()}:{os.getpid()}"  # Lease holder name
+
+@bot.event
+async def setup_hook():
+    """Runs once before the gateway connects."""
+    state = await storage.open()
+    for submission_id, row in state["submissions"].items():
+        submission = bot.video_submissions.add(Submission(submission_id=submission_id, **row))
+        if submission.video_id is None:  # Rows migrated from the one-video-per-user table
+            submission.video_id = normalize_video_id(submission.platform, submission.video_url)
+            storage.upsert("submissions", submission_id, submission)
+    bot.pending_verifications.update(state["pending_verifications"])
+    bot.pending_payouts.update(state["pending_payouts"])
+    bot.leaderboard_messages.update(state["leaderboard_messages"])
+    for submission_id, row in state["view_history"].items():
+        bot.view_history[submission_id] = ViewHistory(row["times"], row["views"])
+    log.info(f"📂 Loaded {len(bot.video_submissions)} submission(s), {len(bot.pending_verifications)} pending verification(s) "
+             f"and {len(bot.pending_payouts)} pending payout(s) from {STORAGE_PATH}.")
+
+    await platform_client.start()
+    await start_metrics()
+    await elect_leader()  # Before the jobs start, so the leader's first leaderboard run isn't skipped
+    work_queue.start()
+    scheduler.start()
+    asyncio.create_task(sync_commands(), name="sync_commands")  # Don't hold up the gateway connection
+
+# ✅ Multi-process Coordination
+# Shard processes share the SQLite file: each keeps its own in-memory state and folds in the rows the others wrote.
+SUBMISSION_SYNC_FIELDS = ("initial_views", "latest_views", "views_per_hour", "last_polled", "server_name", "video_url")
+
+
+def apply_remote_changes(changes, deletions):
+    """Applies rows written by other shard processes to this process's in-memory state."""
+    for submission_id, row in changes.get("submissions", {}).items():
+        submission = bot.video_submissions.by_id.get(submission_id)
+        if submission is None:
+            bot.video_submissions.add(Submission(submission_id=submission_id, **row))
+            continue
+        for field in SUBMISSION_SYNC_FIELDS:  # Identity fields (user, campaign, video) never change
+            setattr(submission, field, row[field])
+        bot.video_submissions.rerank(submission)
+    now = time.time()
+    for submission_id, row in changes.get("view_history", {}).items():
+        remote = ViewHistory(row["times"], row["views"])
+        if submission_id in bot.view_history:
+            bot.view_history[submission_id].merge(remote, now)  # Keep local polls the remote copy hasn't seen yet
+        else:
+            bot.view_history[submission_id] = remote
+    bot.pending_verifications.update(changes.get("pending_verifications", {}))
+    bot.pending_payouts.update(changes.get("pending_payouts", {}))
+
+    for submission_id in deletions.get("submissions", []):
+        bot.video_submissions.remove(submission_id)
+        bot.view_history.pop(submission_id, None)
+    for user_id in deletions.get("pending_verifications", []):
+        bot.pending_verifications.pop(user_id, None)
+    for user_id in deletions.get("pending_payouts", []):
+        bot.pending_payouts.pop(user_id, None)
+
+    # Another process asked for a leader-only job (e.g. /forceupdate on a follower shard)
+    if bot.is_leader:
+        for name in changes.get("job_triggers", {}):
+            if name in scheduler.jobs:
+                scheduler.trigger(name)
+
+async def sync_from_storage():
+    changes, deletions = await storage.read_changes()
+    if any(changes.values()) or any(deletions.values()):
+        apply_remote_changes(changes, deletions)
+
+async def elect_leader():
+    """Takes or renews the leader lease; exactly one live process holds it and runs the leader-only jobs."""
+    was_leader = bot.is_leader
+    started = time.time()  # The stored expiry is counted from inside the call, so this errs on the early side
+    try:
+        bot.is_leader = await storage.acquire_lease("leader", bot.instance_id, LEASE_TTL)
+    except Exception:
+        # Couldn't renew (e.g. the database stayed locked); once our lease has lapsed someone else may lead, so stop
+        if time.time() >= bot.lease_expires:
+            bot.is_leader = False
+            if was_leader:
+                log.warning(f"👑 {bot.instance_id} couldn't renew the leader lease before it expired; stepping down")
+        raise
+    if bot.is_leader:
+        bot.lease_expires = started + LEASE_TTL
+    if bot.is_leader != was_leader:
+        log.info(f"👑 {bot.instance_id} is now the {'leader' if bot.is_leader else 'a follower'}")
+    if bot.is_leader and not was_leader:
+        # Leaderboard messages aren't synced; pick up the ones the previous leader posted so they're edited, not reposted
+        bot.leaderboard_messages = await storage.load_table("leaderboard_messages")
+
+def command_tree_hash():
+    payload = sorted((command.to_dict(bot.tree) for command in bot.tree.get_commands()), key=lambda command: command["name"])
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+async def sync_commands():
+    """Syncs global slash commands only when their definitions changed since the last sync (or SYNC_COMMANDS=always)."""
+    if SYNC_COMMANDS == "never" or (SHARD_IDS and 0 not in SHARD_IDS):
+        return  # One process (the one running shard 0) owns command sync
+    digest = command_tree_hash()
+    if SYNC_COMMANDS != "always" and await storage.get_meta("command_hash") == digest:
+        log.info("⏭️ Slash commands unchanged; skipping sync.")
+        return
+    try:
+        synced = await bot.tree.sync()
+        await storage.set_meta("command_hash", digest)
+        log.info(f"🔄 Synced {len(synced)} command(s).")
+    except Exception as e:
+        log.error(f"❌ Error syncing commands: {e}")
+
+# ✅ #get-verified Moderation
+# 🔹 Channels where only verification commands may be posted (Guild ID -> channel IDs)
+VERIFICATION_ONLY_CHANNELS = {
+    1336579716383117312: {1339695387782549685},  # #get-verified - replace with your actual IDs
+}
+ALLOWED_VERIFICATION_COMMANDS = ("/verify", "/confirmverify")
+MODERATION_FLUSH_INTERVAL = float(os.getenv("MODERATION_FLUSH_INTERVAL", "1"))  # Seconds between bulk deletes
+MODERATION_WARN_COOLDOWN = int(os.getenv("MODERATION_WARN_COOLDOWN", "300"))  # At most one DM warning per user per this many seconds
+MODERATION_DM_CONCURRENCY = int(os.getenv("MODERATION_DM_CONCURRENCY", "5"))  # Warning DMs sent at once
+MODERATION_MAX_WARNINGS = int(os.getenv("MODERATION_MAX_WARNINGS", "25"))  # Warning DMs per flush; the rest wait for the next one
+
+# Flattened once at startup so on_message is a single set lookup
+WATCHED_CHANNEL_IDS = frozenset(channel_id for channel_ids in VERIFICATION_ONLY_CHANNELS.values() for channel_id in channel_ids)
+
+
+class ModerationQueue:
+    """Collects off-topic messages and removes them with bulk deletes, warning each user at most once per cooldown."""
+
+    def __init__(self):
+        self.pending = {}  # channel_id -> (channel, [messages awaiting deletion])
+        self.to_warn = {}  # user_id -> user to DM on the next flush
+        self.warned_at = {}  # user_id -> when they were last warned
+        self.deleted = 0
+        self.warnings = 0
+
+    def report(self, message):
+        self.pending.setdefault(message.channel.id, (message.channel, []))[1].append(message)
+        last_warned = self.warned_at.get(message.author.id, 0)
+        if time.time() - last_warned >= MODERATION_WARN_COOLDOWN:
+            self.warned_at[message.author.id] = time.time()
+            self.to_warn[message.author.id] = message.author
+
+    async def flush(self):
+        pending, self.pending = self.pending, {}
+        to_warn = [self.to_warn.pop(user_id) for user_id in list(self.to_warn)[:MODERATION_MAX_WARNINGS]]
+
+        for channel, messages in pending.values():
+            for start in range(0, len(messages), 100):  # Bulk delete takes at most 100 messages
+                batch = messages[start:start + 100]
+                try:
+                    await channel.delete_messages(batch)
+                    self.deleted += len(batch)
+                except discord.Forbidden:
+                    log.error(f"❌ Bot lacks permission to delete messages in #{channel.name}.")
+                except discord.HTTPException as e:
+                    log.warning(f"⚠️ Failed to delete {len(batch)} message(s) in #{channel.name}: {e}")
+
+        # A raid can queue hundreds of DMs; send a few at a time so the next flush's deletes aren't held up
+        semaphore = asyncio.Semaphore(MODERATION_DM_CONCURRENCY)
+
+        async def warn(user):
+            async with semaphore:
+                try:
+                    await user.send("⚠️ Please only use `/verify` or `/confirmverify` in #get-verified.", delete_after=10)
+                    self.warnings += 1
+                except discord.HTTPException:
+                    pass  # DMs closed; the deletion is warning enough
+
+        await asyncio.gather(*(warn(user) for user in to_warn))
+
+    def prune_warnings(self):
+        cutoff = time.time() - MODERATION_WARN_COOLDOWN
+        for user_id in [user_id for user_id, warned in self.warned_at.items() if warned < cutoff]:
+            del self.warned_at[user_id]
+
+
+moderation = ModerationQueue()
+
 
 @bot.event
 async def on_message(message):
-    """Deletes any messages in #get-verified that are not /verify or /confirmverify."""
+    """Queues any message in #get-verified that is not /verify or /confirmverify for deletion."""
     
     # Ignore bot messages to prevent infinite loops
     if message.author.bot:
         return
 
-    # Set the correct channel ID for #get-verified
-    GET_VERIFIED_CHANNEL_ID = 1339695387782549685  # Replace with your actual channel ID
-
-    # If the message is in #get-verified and not a valid command, delete it
-    if message.channel.id == GET_VERIFIED_CHANNEL_ID:
-        if not (message.content.startswith("/verify") or message.content.startswith("/confirmverify")):
-            try:
-                await message.delete()
-                await message.author.send("⚠️ Please only use `/verify` or `/confirmverify` in #get-verified.", delete_after=10)
-            except discord.Forbidden:
-                print("❌ Bot lacks permission to delete messages in #get-verified.")
-            except discord.HTTPException as e:
-                print(f"⚠️ Failed to delete message: {e}")
-
-    # Process commands so that slash commands still work
-    await bot.process_commands(message)
+    # If the message is in a watched channel and not a valid command, queue it for bulk deletion
+    if message.channel.id in WATCHED_CHANNEL_IDS and not message.content.startswith(ALLOWED_VERIFICATION_COMMANDS):
+        moderation.report(message)
+    # Slash commands arrive as interactions, and there are no prefix commands, so the message needs nothing else
 
 @bot.event
 async def on_ready():
-    print(f"✅ Logged in as {bot.user}")
-    try:
-        synced = await bot.tree.sync()  
-        
-# ✅ Sync global slash commands
-        print(f"🔄 Synced {len(synced)} command(s).")
-    except Exception as e:
-        print(f"❌ Error syncing commands: {e}")
+    shards = f" (shards {sorted(bot.shards)} of {bot.shard_count})" if bot.shard_count else ""
+    log.info(f"✅ Logged in as {bot.user}{shards}")
+
+@bot.event
+async def on_app_command_completion(interaction, command):
+    """Times commands that reply directly; queued commands are timed when their work finishes."""
+    if not interaction.extras.get("queued"):
+        observe_command(interaction)
+
+@bot.tree.error
+async def on_app_command_error(interaction, error):
+    observe_command(interaction, failed=True)
+    command = interaction.command.qualified_name if interaction.command else "unknown"
+    log.error(f"❌ /{command} failed: {error}", exc_info=error)
 
 # ✅ Convert /verify to a Slash Command
 @bot.tree.command(name="verify", description="Verify your TikTok or YouTube account.")
@@ -78,14 +1734,12 @@ async def verify(interaction: discord.Interaction, platform: str, username: str)
     )
 
     # Store verification request
-    if not hasattr(bot, "pending_verifications"):
-        bot.pending_verifications = {}
-
     bot.pending_verifications[interaction.user.id] = {
         "platform": platform,
         "username": username,
         "code": verification_code
     }
+    storage.upsert("pending_verifications", interaction.user.id, bot.pending_verifications[interaction.user.id])
 
 # ✅ Convert /confirmverify to a Slash Command
 @bot.tree.command(name="confirmverify", description="Confirm your TikTok or YouTube verification.")
@@ -99,107 +1753,258 @@ async def confirmverify(interaction: discord.Interaction, platform: str, usernam
     verification_data = bot.pending_verifications[interaction.user.id]
     verification_code = verification_data["code"]
 
-    verified = False
-    if platform.lower() == "tiktok":
-        verified = check_tiktok_bio(username, verification_code)
-    elif platform.lower() == "youtube":
-        verified = check_youtube_bio(username, verification_code)
-
-    if not verified:
-        await interaction.response.send_message("❌ Verification code not found in your bio. Please add it and try again.", ephemeral=True)
-        return
-
-    # Assign Verified role
-    verified_role = discord.utils.get(interaction.guild.roles, name="Verified")
-    if verified_role:
-        await interaction.user.add_roles(verified_role)
-        await interaction.response.send_message(f"✅ @{interaction.user.mention} is now **Verified**!")
-    else:
-        await interaction.response.send_message("⚠️ 'Verified' role not found! Please create it in server settings.", ephemeral=True)
-
-    # Remove from pending verifications
-    del bot.pending_verifications[interaction.user.id]
+    # The bio lookup runs on the work queue; results arrive as followups
+    async def work():
+        verified = False
+        try:
+            if platform.lower() == "tiktok":
+                verified = await check_tiktok_bio(username, verification_code)
+            elif platform.lower() == "youtube":
+                verified = await check_youtube_bio(username, verification_code)
+        except PlatformError as e:
+            # Keep the pending verification so the user can simply run the command again
+            log.warning(f"❌ {platform} API Error during verification: {e}")
+            await interaction.followup.send(
+                f"⚠️ Couldn't reach {platform.capitalize()} right now. Please try `/confirmverify` again in a few minutes.",
+                ephemeral=True,
+            )
+            return
+
+        if not verified:
+            await interaction.followup.send("❌ Verification code not found in your bio. Please add it and try again.", ephemeral=True)
+            return
+
+        # Assign Verified role
+        verified_role = discord.utils.get(interaction.guild.roles, name="Verified")
+        if verified_role:
+            await interaction.user.add_roles(verified_role)
+            await interaction.followup.send("✅ You're now **Verified**!", ephemeral=True)
+            await interaction.channel.send(f"✅ @{interaction.user.mention} is now **Verified**!")
+        else:
+            await interaction.followup.send("⚠️ 'Verified' role not found! Please create it in server settings.", ephemeral=True)
+
+        # Remove from pending verifications
+        bot.pending_verifications.pop(interaction.user.id, None)
+        storage.delete("pending_verifications", interaction.user.id)
+
+    await defer_to_queue(interaction, work)
 
 # ✅ TikTok Bio Check
-def check_tiktok_bio(username, verification_code):
-    """Fetch TikTok bio and check for the verification code."""
-    url = f"https://api.tikapi.io/public/check?username={username}"
+async def fetch_tiktok_bio(username):
+    """Fetches a TikTok user's bio, raising PlatformError on failure."""
+    url = f"{TIKAPI_BASE_URL}/public/check"
     headers = {"X-API-KEY": TIKAPI_KEY}
-    
-    response = requests.get(url, headers=headers)
-    
-    if response.status_code == 200:
-        data = response.json()
-        bio = data.get("userInfo", {}).get("user", {}).get("signature", "")
-        print(f"📢 TikTok Bio for {username}: {bio}")
-        return verification_code.strip().lower() in bio.strip().lower()
 
-    print(f"❌ TikTok API Error: {response.status_code} - {response.text}")
-    return False
+    data = await platform_client.get_json(url, params={"username": username}, headers=headers, provider="tiktok")
+    return data.get("userInfo", {}).get("user", {}).get("signature", "")
 
-# ✅ YouTube Bio Check
-def check_youtube_bio(username, verification_code):
-    """Fetch YouTube channel description and check for the verification code."""
-    youtube = build("youtube", "v3", developerKey=YOUTUBE_API_KEY)
-    
-    request = youtube.channels().list(
-        part="snippet",
-        forUsername=username
-    )
-    response = request.execute()
-
-    if "items" in response and len(response["items"]) > 0:
-        bio = response["items"][0]["snippet"].get("description", "")
-        print(f"📢 YouTube Bio for {username}: {bio}")
-        return verification_code.strip().lower() in bio.strip().lower()
+async def check_tiktok_bio(username, verification_code):
+    """Fetch TikTok bio and check for the verification code (PlatformError propagates)."""
+    bio = await bio_cache.get_or_fetch(("tiktok", username.lower()), lambda: fetch_tiktok_bio(username))
 
-    return False
+    log.debug(f"📢 Checked TikTok bio for {username} ({len(bio)} characters)")
+    found = verification_code.strip().lower() in bio.strip().lower()
+    if not found:
+        bio_cache.invalidate(("tiktok", username.lower()))  # The user is about to edit their bio and retry
+    return found
 
+# ✅ YouTube Bio Check
+async def check_youtube_bio(username, verification_code):
+    """Fetch YouTube channel description and check for the verification code (PlatformError propagates)."""
+    bio = await bio_cache.get_or_fetch(
+        ("youtube", username.lower()), lambda: youtube_client.get_channel_description(username)
+    )
 
-import json
-import time
+    log.debug(f"📢 Checked YouTube bio for {username} ({len(bio or '')} characters)")
+    found = bio is not None and verification_code.strip().lower() in bio.strip().lower()
+    if not found:
+        bio_cache.invalidate(("youtube", username.lower()))  # The user is about to edit their bio and retry
+    return found
 
-# Store submitted videos
-if not hasattr(bot, "video_submissions"):
-    bot.video_submissions = {}
 
 # ✅ /submitvideo Command
 @bot.tree.command(name="submitvideo", description="Submit a TikTok or YouTube video to track views.")
 @app_commands.describe(platform="Select the platform", video_url="Paste your video link")
 async def submitvideo(interaction: discord.Interaction, platform: str, video_url: str):
     """Allows users to submit their video link for tracking."""
+    platform = platform.lower()
     platforms = ["tiktok", "youtube"]
-    if platform.lower() not in platforms:
+    if platform not in platforms:
         await interaction.response.send_message("❌ Invalid platform. Use `/submitvideo tiktok <video_url>` or `/submitvideo youtube <video_url>`.", ephemeral=True)
         return
 
-    # Fetch initial views
-    initial_views = 0
-    if platform == "tiktok":
-        initial_views = get_tiktok_views(video_url)
-    elif platform == "youtube":
-        initial_views = get_youtube_views(video_url)
-
-    # Store video submission with server ID (campaign)
-    bot.video_submissions[interaction.user.id] = {
-        "server_id": interaction.guild.id,  # Store campaign ID
-        "server_name": interaction.guild.name,  # Store campaign name
-        "platform": platform,
-        "video_url": video_url,
-        "submitted_at": time.time(),
-        "initial_views": initial_views,
-        "latest_views": initial_views
-    }
+    video_id = normalize_video_id(platform, video_url)
+    if not video_id:
+        await interaction.response.send_message(f"❌ That doesn't look like a {platform.capitalize()} video link.", ephemeral=True)
+        return
 
-    await interaction.response.send_message(
-        f"✅ @{interaction.user.mention}, your video has been submitted for tracking in **{interaction.guild.name}**!\n"
-        f"📊 Initial Views: **{initial_views}**", ephemeral=True
-    )
+    if bot.video_submissions.find_video(platform, video_id):
+        await interaction.response.send_message("⚠️ This video is already being tracked.", ephemeral=True)
+        return
+
+    # The initial view lookup runs on the work queue; results arrive as followups
+    async def work():
+        initial_views = 0
+        try:
+            if platform == "tiktok":
+                initial_views = await get_tiktok_views(video_url)
+            elif platform == "youtube":
+                initial_views = await get_youtube_views(video_url)
+        except PlatformError as e:
+            # Don't start tracking from a bogus baseline of 0 views
+            log.warning(f"❌ {platform} API Error during submission: {e}")
+            if e.status == 404:
+                await interaction.followup.send(
+                    f"❌ {platform.capitalize()} couldn't find that video. Make sure it's public, then submit it again.",
+                    ephemeral=True,
+                )
+                return
+            await interaction.followup.send(
+                f"⚠️ Couldn't fetch views from {platform.capitalize()} right now. Please submit again in a few minutes.",
+                ephemeral=True,
+            )
+            return
+
+        submission_id = await storage.next_id("submission_id")  # Allocated by the shared store so shards never collide
+
+        # Check again: the same link may have been submitted while we were fetching views
+        if bot.video_submissions.find_video(platform, video_id):
+            await interaction.followup.send("⚠️ This video is already being tracked.", ephemeral=True)
+            return
+
+        # Store video submission with server ID (campaign)
+        submission = bot.video_submissions.add(Submission(
+            submission_id=submission_id,
+            user_id=interaction.user.id,
+            server_id=interaction.guild.id,  # Store campaign ID
+            server_name=interaction.guild.name,  # Store campaign name
+            platform=platform,
+            video_id=video_id,
+            video_url=video_url,
+            submitted_at=time.time(),
+            initial_views=initial_views,
+            latest_views=initial_views,
+        ))
+        storage.upsert("submissions", submission.submission_id, submission)
+        record_history(submission, initial_views, submission.submitted_at)
+
+        await interaction.followup.send(
+            f"✅ @{interaction.user.mention}, your video has been submitted for tracking in **{interaction.guild.name}**!\n"
+            f"📊 Initial Views: **{initial_views}**", ephemeral=True
+        )
+
+    await defer_to_queue(interaction, work)
+
+# ✅ /allsubmissions Command
+ALLSUBMISSIONS_PAGE_SIZE = 15  # Videos per page
+SUBMISSION_EXPORT_COLUMNS = (
+    "submission_id", "server_id", "server_name", "user_id", "platform", "video_id", "video_url",
+    "submitted_at", "initial_views", "latest_views",
+)
+
+class SubmissionPager(discord.ui.View):
+    """Prev/next buttons over a list of submission IDs; each page is rendered only when it is shown.
+    Page boundaries are found as pages are visited: a page ends where the next line would pass Discord's limit."""
+
+    def __init__(self, owner_id, submission_ids):
+        super().__init__(timeout=600)
+        self.owner_id = owner_id
+        self.submission_ids = submission_ids
+        self.page = 0
+        self.page_starts = [0]  # Index of the first ID on each page visited so far (plus the next unvisited one)
+
+    def render(self):
+        start = self.page_starts[self.page]
+        budget = DISCORD_MESSAGE_LIMIT - 100  # Room for the header line
+        body = ""
+        campaign = None
+        end = start
+        while end < len(self.submission_ids) and end - start < ALLSUBMISSIONS_PAGE_SIZE:
+            vid = bot.video_submissions.by_id.get(self.submission_ids[end])
+            if vid is not None:  # Otherwise removed since the list was built
+                lines = ""
+                if vid.server_name != campaign:
+                    lines += f"\n**🎯 {vid.server_name}:**\n"
+                lines += f"- 🔗 [{vid.video_url}]({vid.video_url}) on **{vid.platform.capitalize()}** - **{vid.latest_views} Views** - <@{vid.user_id}>\n"
+                if body and len(body) + len(lines) > budget:
+                    break  # This video opens the next page
+                campaign = vid.server_name
+                body += lines[:budget]  # A lone oversized line is cut rather than skipped
+            end += 1
+
+        if self.page == len(self.page_starts) - 1 and end < len(self.submission_ids):
+            self.page_starts.append(end)
+        self.update_buttons()
+        shown = f"{start + 1}-{end}" if end > start else "none"
+        return f"**📊 Submitted Videos** (page {self.page + 1}, videos {shown} of {len(self.submission_ids)})\n" + body
+
+    def update_buttons(self):
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = self.page >= len(self.page_starts) - 1
+
+    async def interaction_check(self, interaction: discord.Interaction):
+        return interaction.user.id == self.owner_id
+
+    async def show_page(self, interaction, page):
+        self.page = max(0, min(page, len(self.page_starts) - 1))
+        await interaction.response.edit_message(content=self.render(), view=self)
+
+    @discord.ui.button(label="◀ Prev", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.show_page(interaction, self.page - 1)
+
+    @discord.ui.button(label="Next ▶", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.show_page(interaction, self.page + 1)
+
+def find_submission_ids(campaign=None, platform=None, user_id=None):
+    """Collects matching submission IDs from the narrowest index, grouped by campaign."""
+    store = bot.video_submissions
+    if user_id is not None:
+        sources = [store.by_user.get(user_id, {})]
+    elif campaign is not None:
+        sources = [videos for guild_id, videos in store.by_guild.items()
+                   if str(guild_id) == campaign or (videos and next(iter(videos.values())).server_name.lower() == campaign.lower())]
+    else:
+        sources = list(store.by_guild.values())
+
+    submission_ids = []
+    for videos in sources:
+        for submission_id, vid in videos.items():
+            if platform and vid.platform != platform:
+                continue
+            if campaign and str(vid.server_id) != campaign and vid.server_name.lower() != campaign.lower():
+                continue
+            submission_ids.append(submission_id)
+    if user_id is not None:
+        submission_ids.sort(key=lambda submission_id: store.by_id[submission_id].server_id)  # Keep campaigns together
+    return submission_ids
+
+def write_submissions_export(submission_ids):
+    """Writes the given submissions to an in-memory CSV file."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(SUBMISSION_EXPORT_COLUMNS)
+    for submission_id in submission_ids:
+        vid = bot.video_submissions.by_id.get(submission_id)
+        if vid is not None:
+            writer.writerow([vid.get(column) for column in SUBMISSION_EXPORT_COLUMNS])
+    return io.BytesIO(buffer.getvalue().encode())
 
-# ✅ /allsubmissions Command    
 @bot.tree.command(name="allsubmissions", description="View all submitted videos across campaigns (admin & server team Only).")
-async def allsubmissions(interaction: discord.Interaction):
-    """Shows all submitted videos grouped by campaign (admin & server team Team Only)."""
+@app_commands.describe(
+    campaign="Only show this campaign (server name or ID)",
+    platform="Only show this platform",
+    user="Only show this user's videos",
+    export="Attach every matching video as a CSV file instead of paging",
+)
+@app_commands.choices(platform=[
+    app_commands.Choice(name="TikTok", value="tiktok"),
+    app_commands.Choice(name="YouTube", value="youtube"),
+])
+async def allsubmissions(interaction: discord.Interaction, campaign: str = None, platform: str = None,
+                         user: discord.User = None, export: bool = False):
+    """Shows all submitted videos grouped by campaign, one page at a time (admin & server team Team Only)."""
     
     # 🔹 Check if user is an admin
     is_admin = interaction.user.guild_permissions.administrator
@@ -213,95 +2018,471 @@ async def allsubmissions(interaction: discord.Interaction):
         await interaction.response.send_message("❌ You do not have permission to use this command.", ephemeral=True)
         return
 
-    if not bot.video_submissions:
+    submission_ids = find_submission_ids(campaign, platform, user.id if user else None)
+    if not submission_ids:
         await interaction.response.send_message("❌ No video submissions found.", ephemeral=True)
         return
 
-    # 🔹 Group videos by campaign
-    campaign_videos = {}
-    for user_id, video in bot.video_submissions.items():
-        campaign_name = video["server_name"]
-        if campaign_name not in campaign_videos:
-            campaign_videos[campaign_name] = []
-        campaign_videos[campaign_name].append(video)
-
-    # 🔹 Format response
-    response = "**📊 All Submitted Videos by Campaign:**\n\n"
-    for campaign, videos in campaign_videos.items():
-        response += f"**🎯 {campaign}:**\n"
-        for vid in videos:
-            response += f"- 🔗 [{vid['video_url']}]({vid['video_url']}) on **{vid['platform'].capitalize()}**\n"
-        response += "\n"
+    # 🔹 Export everything as a file attachment
+    if export:
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        csv_file = await asyncio.to_thread(write_submissions_export, submission_ids)
+        await interaction.followup.send(
+            f"📎 {len(submission_ids)} submitted video(s).",
+            file=discord.File(csv_file, filename=f"submissions-{int(time.time())}.csv"),
+            ephemeral=True,
+        )
+        return
 
-    await interaction.response.send_message(response, ephemeral=True)
+    # 🔹 Otherwise page through them
+    pager = SubmissionPager(interaction.user.id, submission_ids)
+    await interaction.response.send_message(pager.render(), view=pager, ephemeral=True)
 
 
 # ✅ /checkviews Command
-@bot.tree.command(name="checkviews", description="Check the current views of your submitted video.")
-async def checkviews(interaction: discord.Interaction):
-    """Allows users to check the view count of their submitted video."""
-    if interaction.user.id not in bot.video_submissions:
+CHECKVIEWS_MAX_VIDEOS = 10  # Keeps the reply well under Discord's 2000-character limit
+
+@bot.tree.command(name="checkviews", description="Check the current views of your submitted videos.")
+@app_commands.describe(video_url="Only check this video (defaults to your most recent videos)")
+async def checkviews(interaction: discord.Interaction, video_url: str = None):
+    """Allows users to check the view counts of their submitted videos."""
+    videos = bot.video_submissions.for_user(interaction.user.id)
+    if not videos:
         await interaction.response.send_message("❌ You haven't submitted a video yet. Use `/submitvideo` first.", ephemeral=True)
         return
 
-    video_data = bot.video_submissions[interaction.user.id]
-    platform = video_data["platform"]
-    video_url = video_data["video_url"]
-
-    # Fetch views from the appropriate API
-    if platform == "tiktok":
-        views = get_tiktok_views(video_url)
-    elif platform == "youtube":
-        views = get_youtube_views(video_url)
-    else:
-        views = 0
+    if video_url:
+        video_ids = {normalize_video_id("tiktok", video_url), normalize_video_id("youtube", video_url)} - {None}
+        videos = [video for video in videos if video.video_id in video_ids]
+        if not videos:
+            await interaction.response.send_message("❌ That video isn't one of your submissions.", ephemeral=True)
+            return
+
+    total = len(videos)
+    videos = sorted(videos, key=lambda v: v.submitted_at, reverse=True)[:CHECKVIEWS_MAX_VIDEOS]
+
+    # The view lookups run on the work queue; results arrive as a followup
+    async def work():
+        # Fetch views from the appropriate API; every YouTube video shares one batched lookup
+        youtube_lookup = asyncio.ensure_future(get_youtube_views_many(
+            [video.video_id for video in videos if video.platform == "youtube" and video.video_id]
+        ))
+
+        async def lookup(video):
+            if video.platform == "youtube" and video.video_id:
+                views = (await youtube_lookup)[video.video_id]
+                if isinstance(views, Exception):
+                    raise views
+                return views
+            return await get_video_views(video)
+
+        counts = await asyncio.gather(*(lookup(video) for video in videos), return_exceptions=True)
+
+        # Update stored views
+        lines = []
+        for video, views in zip(videos, counts):
+            if isinstance(views, PlatformError):
+                # Show the last known count rather than recording a failed lookup as 0
+                log.warning(f"❌ {video.platform} API Error during /checkviews: {views}")
+                lines.append(
+                    f"📊 **{video.latest_views}** views on {video.platform.capitalize()} (last known, couldn't refresh) "
+                    f"- 🔗 [View Video]({video.video_url})"
+                )
+                continue
+            if isinstance(views, BaseException):
+                raise views
+            record_views(video, views)
+            storage.upsert("submissions", video.submission_id, video)
+            lines.append(f"📊 **{views}** views on {video.platform.capitalize()} - 🔗 [View Video]({video.video_url})")
+        if total > len(videos):
+            lines.append(f"…showing your {len(videos)} most recent of {total} videos.")
+
+        await interaction.followup.send("\n".join(lines), ephemeral=True)
+
+    await defer_to_queue(interaction, work)
+
+async def get_video_views(video):
+    """Fetches the current view count of a submission from its platform, raising PlatformError on failure."""
+    if video.platform == "tiktok":
+        return await get_tiktok_views(video.video_url)
+    if video.platform == "youtube":
+        return await get_youtube_views(video.video_url)
+    return 0
 
-    # Update stored views
-    bot.video_submissions[interaction.user.id]["views"] = views
+# ✅ Function to Fetch TikTok Views
+def extract_tiktok_video_id(video_url):
+    """Extracts the numeric video ID from a TikTok URL, or returns None."""
+    video_id = video_url.split("/video/")[-1].split("?")[0].strip("/")  # Extracts only the numeric video ID
+    return video_id if video_id.isdigit() else None
+
+async def fetch_tiktok_views(video_id, background=False):
+    """Fetches the view count for a TikTok video ID, raising PlatformError on failure."""
+    url = f"{TIKAPI_BASE_URL}/public/video"
+    headers = {
+        "X-API-KEY": TIKAPI_KEY,
+        "accept": "application/json"
+    }
 
-    await interaction.response.send_message(f"📊 Your video has **{views}** views on {platform.capitalize()}!\n🔗 [View Video]({video_url})", ephemeral=True)
+    data = await platform_client.get_json(
+        url, params={"id": video_id}, headers=headers, provider="tiktok", background=background
+    )
+    return data.get("data", {}).get("video", {}).get("stats", {}).get("playCount", 0)
 
-# ✅ Function to Fetch TikTok Views
-def get_tiktok_views(video_url):
-    """Fetches the view count of a TikTok video using the correct TikAPI endpoint."""
+async def get_tiktok_views(video_url):
+    """Fetches the view count of a TikTok video using the correct TikAPI endpoint (PlatformError propagates)."""
+    video_id = extract_tiktok_video_id(video_url)
+    log.debug(f"📢 Extracted TikTok Video ID: {video_id}")
     
-    # Extract the video ID from the TikTok URL
-    try:
-        video_id = video_url.split("/video/")[-1].split("?")[0]  # Extracts only the numeric video ID
-        print(f"📢 Extracted TikTok Video ID: {video_id}")  # Debugging line
-    except Exception as e:
-        print(f"❌ Error extracting video ID: {e}")
+    # Check if the extracted ID is valid (should be numeric)
+    if not video_id:
+        log.warning(f"❌ Invalid TikTok video URL: {video_url}")
         return 0
 
-    # Check if the extracted ID is valid (should be numeric)
-    if not video_id.isdigit():
-        print(f"❌ Invalid TikTok Video ID: {video_id}")
+    views = await view_cache.get_or_fetch(("tiktok", video_id), lambda: fetch_tiktok_views(video_id))
+
+    log.debug(f"✅ TikTok Video Views: {views}")
+    return views
+
+
+# ✅ Function to Fetch YouTube Views
+async def get_youtube_views_many(video_ids):
+    """View counts for several YouTube video IDs: cached counts are reused and the rest share one batched videos.list lookup.
+    Returns {video_id: views or PlatformError}."""
+    async def fetch(keys):
+        views = await youtube_client.get_video_views([video_id for _, video_id in keys])
+        return {
+            # videos.list silently leaves out missing, private and deleted videos; that isn't a count of 0
+            key: views[key[1]] if key[1] in views else PlatformError(404, f"YouTube video {key[1]} not found (private or deleted?)")
+            for key in keys
+        }
+
+    results = await view_cache.get_or_fetch_many([("youtube", video_id) for video_id in video_ids], fetch)
+    return {video_id: result for (_, video_id), result in results.items()}
+
+async def get_youtube_views(video_url):
+    """Fetches the view count of a YouTube video via the batched videos.list endpoint (PlatformError propagates)."""
+    video_id = extract_youtube_video_id(video_url)
+    if not video_id:
+        log.warning(f"❌ Invalid YouTube video URL: {video_url}")
         return 0
 
-    # ✅ Use the correct TikAPI endpoint
-    url = f"https://api.tikapi.io/public/video?id={video_id}"
-    headers = {
-        "X-API-KEY": TIKAPI_KEY,
-        "accept": "application/json"
-    }
+    views = (await get_youtube_views_many([video_id]))[video_id]
+    if isinstance(views, Exception):
+        raise views
+
+    log.debug(f"✅ YouTube Video Views: {views}")
+    return views
+
+# ✅ Background View Refresh
+VIEW_REFRESH_TICK = int(os.getenv("VIEW_REFRESH_TICK", "60"))  # How often the refresh job looks for due videos (seconds)
+VIEW_REFRESH_INTERVAL = int(os.getenv("VIEW_REFRESH_INTERVAL", "3600"))  # Re-poll interval for stale videos
+VIEW_REFRESH_HOT_INTERVAL = int(os.getenv("VIEW_REFRESH_HOT_INTERVAL", "600"))  # Re-poll interval for hot videos
+HOT_VIDEO_MAX_AGE = int(os.getenv("HOT_VIDEO_MAX_AGE", str(48 * 3600)))  # Videos younger than this are hot
+HOT_VIDEO_MIN_GROWTH = float(os.getenv("HOT_VIDEO_MIN_GROWTH", "1000"))  # ...as are videos gaining this many views/hour
+TIKAPI_RATE_LIMIT = float(os.getenv("TIKAPI_RATE_LIMIT", "2"))  # Background TikAPI requests per second
+TIKAPI_BURST = int(os.getenv("TIKAPI_BURST", "5"))
+
+
+class TokenBucket:
+    """Async token bucket allowing `rate` acquisitions per second with bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:  # Waiters are served in arrival order
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+tiktok_bucket = TokenBucket(TIKAPI_RATE_LIMIT, TIKAPI_BURST)
+
+
+def is_hot_video(video, now):
+    """Recent or fast-growing videos are polled more often than stale ones."""
+    return now - video.submitted_at < HOT_VIDEO_MAX_AGE or video.views_per_hour >= HOT_VIDEO_MIN_GROWTH
+
+def refresh_overdue(video, now):
+    """Seconds past the video's re-poll interval (negative while it isn't due yet)."""
+    interval = VIEW_REFRESH_HOT_INTERVAL if is_hot_video(video, now) else VIEW_REFRESH_INTERVAL
+    return now - (video.last_polled or video.submitted_at) - interval
+
+def is_refresh_due(video, now):
+    return refresh_overdue(video, now) >= 0
+
+def record_views(video, views, now=None):
+    """Stores a freshly polled view count and the growth rate since the previous poll."""
+    now = now or time.time()
+    elapsed_hours = max(now - (video.last_polled or video.submitted_at), 1) / 3600
+    video.views_per_hour = max(views - video.latest_views, 0) / elapsed_hours
+    video.latest_views = views
+    video.last_polled = now
+    bot.video_submissions.rerank(video)
+    record_history(video, views, now)
+
+async def refresh_views(force=False):
+    """Re-polls due videos: YouTube in batched requests, TikTok spread under the token bucket, recording each count as it arrives.
+    Each tick takes only as many TikTok videos as the bucket can serve before the next tick, most overdue first."""
+    now = time.time()
+    due = [video for video in bot.video_submissions if video.video_id and (force or is_refresh_due(video, now))]
+    if not due:
+        return 0
 
-    response = requests.get(url, headers=headers)
+    youtube_videos = {}  # video_id -> [submissions]
+    tiktok_videos = {}
+    due.sort(key=lambda video: refresh_overdue(video, now), reverse=True)
+    for video in due:
+        target = youtube_videos if video.platform == "youtube" else tiktok_videos
+        target.setdefault(video.video_id, []).append(video)
+    tiktok_limit = int(TIKAPI_RATE_LIMIT * VIEW_REFRESH_TICK) + TIKAPI_BURST
+    deferred = max(len(tiktok_videos) - tiktok_limit, 0)  # Still due, so picked up by the next ticks
+    tiktok_videos = dict(list(tiktok_videos.items())[:tiktok_limit])
+
+    updated = 0
+
+    async def record(platform, index, views):
+        nonlocal updated
+        now = time.time()
+        for position, (video_id, count) in enumerate(views.items(), start=1):
+            if count is None:
+                continue  # Keep the last known count rather than storing 0 on an API error
+            view_cache.set((platform, video_id), count)  # Fresh counts also serve /checkviews
+            for video in index.get(video_id, []):
+                record_views(video, count, now)
+                storage.upsert("submissions", video.submission_id, video)
+                updated += 1
+            if position % 500 == 0:
+                await asyncio.sleep(0)  # Don't stall the event loop on a large batch
+
+    async def poll_youtube(batch):
+        try:
+            views = await youtube_client.get_video_views(batch, background=True)
+        except PlatformError as e:
+            log.warning(f"❌ YouTube API Error during view refresh ({len(batch)} video(s)): {e}")
+            return
+        except Exception as e:  # A malformed payload must not sink the other batches or the TikTok polls
+            log.error(f"❌ Unexpected YouTube response during view refresh: {type(e).__name__}: {e}", exc_info=e)
+            return
+        await record("youtube", youtube_videos, views)  # Per batch, so one failed request loses only its own videos
+
+    async def poll_tiktok(video_id):
+        await tiktok_bucket.acquire()
+        try:
+            views = await fetch_tiktok_views(video_id, background=True)
+        except PlatformError as e:
+            log.warning(f"❌ TikTok API Error during view refresh ({video_id}): {e}")
+            return
+        except Exception as e:  # One malformed payload must not sink every other poll in the gather
+            log.error(f"❌ Unexpected TikTok response during view refresh ({video_id}): {type(e).__name__}: {e}", exc_info=e)
+            return
+        await record("tiktok", tiktok_videos, {video_id: views})  # Recorded now, so a cancelled run keeps what it paid for
+
+    youtube_ids = list(youtube_videos)
+    youtube_batches = [youtube_ids[i:i + YOUTUBE_BATCH_SIZE] for i in range(0, len(youtube_ids), YOUTUBE_BATCH_SIZE)]
+    await asyncio.gather(
+        *(poll_youtube(batch) for batch in youtube_batches),
+        *(poll_tiktok(video_id) for video_id in tiktok_videos),
+    )
 
-    if response.status_code == 200:
-        data = response.json()
-        views = data.get("data", {}).get("video", {}).get("stats", {}).get("playCount", 0)
-        print(f"✅ TikTok Video Views: {views}")
-        return views
+    log.info(f"🔄 Refreshed views for {updated}/{len(due)} due video(s)"
+             + (f"; {deferred} TikTok video(s) left for the next tick." if deferred else "."))
+    return updated
+
+# ✅ View History & Growth Analytics
+HISTORY_RAW_WINDOW = int(os.getenv("HISTORY_RAW_WINDOW", str(24 * 3600)))  # Keep every poll this recent
+HISTORY_HOURLY_WINDOW = int(os.getenv("HISTORY_HOURLY_WINDOW", str(7 * 24 * 3600)))  # ...then one point per hour, then one per day
+HISTORY_DOWNSAMPLE_INTERVAL = int(os.getenv("HISTORY_DOWNSAMPLE_INTERVAL", str(6 * 3600)))
+GROWTH_CURVE_POINTS = 24  # Samples drawn in a /growth sparkline
+SPARKLINE_BLOCKS = "▁▂▃▄▅▆▇█"
+
+
+class ViewHistory:
+    """One video's polled view counts as two parallel typed arrays: 4-byte timestamps and 8-byte counts."""
+
+    __slots__ = ("times", "views")
+
+    def __init__(self, times=b"", views=b""):
+        self.times = array("I")  # Unix seconds, ascending
+        self.views = array("q")
+        self.times.frombytes(times)
+        self.views.frombytes(views)
+
+    def __len__(self):
+        return len(self.times)
+
+    def append(self, timestamp, views):
+        timestamp = int(timestamp)
+        if self.times and timestamp <= self.times[-1]:
+            self.views[-1] = views  # Same second as the last poll: keep the newer count
+            return
+        self.times.append(timestamp)
+        self.views.append(views)
+
+    def views_at(self, timestamp):
+        """View count at `timestamp` (the last sample at or before it, or the first sample)."""
+        index = bisect_right(self.times, int(timestamp)) - 1
+        return self.views[max(index, 0)]
+
+    def growth(self, window, now):
+        """Views gained per hour over the last `window` seconds, found by binary search instead of scanning samples."""
+        if len(self.times) < 2:
+            return 0.0
+        start = max(now - window, self.times[0])
+        hours = max(self.times[-1] - start, 1) / 3600
+        return (self.views[-1] - self.views_at(start)) / hours
+
+    def curve(self, points):
+        """Evenly spaced samples across the whole history, for plotting."""
+        if not self.times:
+            return []
+        first, last = self.times[0], self.times[-1]
+        step = (last - first) / max(points - 1, 1)
+        return [self.views_at(first + step * i) for i in range(points)]
+
+    def downsample(self, now):
+        """Thins older samples: raw inside HISTORY_RAW_WINDOW, hourly up to HISTORY_HOURLY_WINDOW, daily beyond. Returns True if anything was dropped."""
+        raw_start = bisect_left(self.times, int(now - HISTORY_RAW_WINDOW))
+        if raw_start < 2:
+            return False
+
+        hourly_start = int(now - HISTORY_HOURLY_WINDOW)
+        times, views = array("I", self.times[:1]), array("q", self.views[:1])  # The first sample is always kept
+        previous_bucket = None
+        for index in range(1, raw_start):
+            timestamp = self.times[index]
+            bucket = ("day", timestamp // 86400) if timestamp < hourly_start else ("hour", timestamp // 3600)
+            if bucket == previous_bucket:
+                times[-1], views[-1] = timestamp, self.views[index]  # Keep the last sample in each bucket
+            else:
+                times.append(timestamp)
+                views.append(self.views[index])
+                previous_bucket = bucket
+
+        if len(times) == raw_start:
+            return False
+        times.extend(self.times[raw_start:])
+        views.extend(self.views[raw_start:])
+        self.times, self.views = times, views
+        return True
+
+    def merge(self, other, now):
+        """Folds in samples from another process's copy of this history, then re-thins so downsampled points stay dropped."""
+        if other.times == self.times[:len(other.times)]:
+            return  # Nothing we don't already have
+        if self.times == other.times[:len(self.times)]:
+            self.times, self.views = array("I", other.times), array("q", other.views)  # Theirs just has newer polls
+            return
+        samples = dict(zip(other.times, other.views))
+        samples.update(zip(self.times, self.views))  # Same second in both: keep ours
+        self.times = array("I", sorted(samples))
+        self.views = array("q", (samples[timestamp] for timestamp in self.times))
+        self.downsample(now)
+
+    def as_row(self):
+        return {"times": self.times.tobytes(), "views": self.views.tobytes()}
+
+
+def merge_history_rows(stored, row):
+    """Storage merger for view_history: any shard may poll a video, so rows are combined rather than replaced."""
+    history = ViewHistory(*row)
+    history.merge(ViewHistory(*stored), time.time())
+    return history.times.tobytes(), history.views.tobytes()
+
+
+storage.mergers["view_history"] = merge_history_rows
+
+
+def record_history(video, views, now):
+    history = bot.view_history.setdefault(video.submission_id, ViewHistory())
+    history.append(now, views)
+    storage.upsert("view_history", video.submission_id, history.as_row())
+
+async def downsample_history():
+    """Thins every video's history, yielding to the event loop between batches."""
+    now = time.time()
+    thinned = 0
+    for index, (submission_id, history) in enumerate(list(bot.view_history.items()), start=1):
+        if submission_id not in bot.video_submissions.by_id:
+            del bot.view_history[submission_id]  # The submission was removed
+            storage.delete("view_history", submission_id)
+        elif history.downsample(now):
+            storage.upsert("view_history", submission_id, history.as_row())
+            thinned += 1
+        if index % 500 == 0:
+            await asyncio.sleep(0)
+    log.info(f"📉 Downsampled view history for {thinned} video(s).")
+
+def sparkline(values):
+    low, high = min(values), max(values)
+    span = (high - low) or 1
+    return "".join(SPARKLINE_BLOCKS[int((value - low) / span * (len(SPARKLINE_BLOCKS) - 1))] for value in values)
+
+# ✅ /growth Command
+@bot.tree.command(name="growth", description="Show a video's view growth curve.")
+@app_commands.describe(video_url="The submitted video's link")
+async def growth(interaction: discord.Interaction, video_url: str):
+    """Shows how a tracked video's views grew over time."""
+    video = None
+    for platform in ("tiktok", "youtube"):
+        video_id = normalize_video_id(platform, video_url)
+        video = bot.video_submissions.find_video(platform, video_id) if video_id else None
+        if video:
+            break
+    history = bot.view_history.get(video.submission_id) if video else None
+    if not history:
+        await interaction.response.send_message("❌ That video isn't being tracked yet.", ephemeral=True)
+        return
 
-    print(f"❌ TikTok API Error: {response.status_code} - {response.text}")
-    return 0
+    now = time.time()
+    curve = history.curve(GROWTH_CURVE_POINTS)
+    started = f"<t:{history.times[0]}:R>"
+    await interaction.response.send_message(
+        f"📈 **Growth for** [{video.video_url}]({video.video_url})\n"
+        f"`{sparkline(curve)}`\n"
+        f"Tracked since {started}: **{history.views[0]}** → **{history.views[-1]}** views "
+        f"({len(history)} samples)\n"
+        f"Last 24h: **{history.growth(24 * 3600, now):,.0f}** views/hour - "
+        f"last 7d: **{history.growth(7 * 24 * 3600, now):,.0f}** views/hour",
+        ephemeral=True,
+    )
 
+# ✅ /fastestgrowing Command
+@bot.tree.command(name="fastestgrowing", description="Rank this campaign's videos by recent view growth.")
+@app_commands.describe(hours="Growth window in hours (default 24)")
+async def fastestgrowing(interaction: discord.Interaction, hours: app_commands.Range[int, 1, 720] = 24):
+    """Lists the campaign's fastest-growing videos over the chosen window."""
+    now = time.time()
+    window = hours * 3600
+    ranked = heapq.nlargest(
+        LEADERBOARD_SIZE,
+        (
+            (bot.view_history[video.submission_id].growth(window, now), video)
+            for video in bot.video_submissions.for_guild(interaction.guild.id)
+            if video.submission_id in bot.view_history
+        ),
+        key=lambda item: item[0],
+    )
+    if not ranked:
+        await interaction.response.send_message("❌ No view history for this campaign yet.", ephemeral=True)
+        return
 
-# ✅ Function to Fetch YouTube
+    response = f"**🚀 {interaction.guild.name} - Fastest Growing (last {hours}h):**\n\n"
+    for i, (rate, vid) in enumerate(ranked, start=1):
+        response += f"**#{i}** - [{vid.video_url}]({vid.video_url}) on **{vid.platform.capitalize()}** - **{rate:,.0f} views/hour**\n"
+    await interaction.response.send_message(response[:DISCORD_MESSAGE_LIMIT], ephemeral=True)
 
-# ✅ Global Leaderboard
 
-import asyncio
+# ✅ Global Leaderboard
 
 # 🔹 Replace these with actual channel IDs
 CAMPAIGN_LEADERBOARD_CHANNELS = {
@@ -309,71 +2490,180 @@ CAMPAIGN_LEADERBOARD_CHANNELS = {
     #234567890123456789: 876543210987654321   # Add more campaign servers
 }
 GLOBAL_LEADERBOARD_CHANNEL_ID = 1339557250607616002  # Main server global leaderboard
+LEADERBOARD_SIZE = 10  # Videos shown per leaderboard
+LEADERBOARD_MODE = os.getenv("LEADERBOARD_MODE", "edit")  # "edit" keeps one pinned message per board, "purge" clears and re-posts
+LEADERBOARD_PUBLISH_CONCURRENCY = int(os.getenv("LEADERBOARD_PUBLISH_CONCURRENCY", "5"))  # Boards published at once
+LEADERBOARD_SLOW_SECONDS = float(os.getenv("LEADERBOARD_SLOW_SECONDS", "10"))  # Log boards slower than this
+
+bot.leaderboard_timings = {}  # Board key -> seconds its last publish took
+bot.channel_locks = {}  # Channel ID -> lock, so boards sharing a channel don't purge each other mid-post
+
+# Campaign guild ID (or "global") -> top-K snapshot last posted, so unchanged boards aren't re-rendered
+bot.rendered_leaderboards = {}
+
+def leaderboard_channel(channel_id):
+    """The cached channel, or a partial one when its guild is on a shard another process runs."""
+    return bot.get_channel(channel_id) or bot.get_partial_messageable(channel_id)
+
+def leaderboard_snapshot(videos):
+    return tuple((video.submission_id, video.latest_views) for video in videos)
+
+def render_leaderboard_pages(header, lines):
+    """Splits a leaderboard into as few messages as fit Discord's 2000-character limit."""
+    pages = []
+    page = header
+    for line in lines:
+        if len(page) + len(line) > DISCORD_MESSAGE_LIMIT:
+            pages.append(page)
+            page = ""
+        page += line[:DISCORD_MESSAGE_LIMIT]
+    pages.append(page)
+    return pages
+
+async def purge_and_post(channel, pages, label):
+    """Legacy mode: clears the entire channel history and posts the leaderboard again."""
+    if not hasattr(channel, "purge"):
+        log.warning(f"⚠️ Can't purge {label}: its channel is on another shard process, so only posting")
+    else:
+        try:
+            # ✅ Purge entire channel history
+            await channel.purge()
+            log.info(f"✅ Cleared all messages in {channel.name} ({label})")
+        except discord.Forbidden:
+            log.error(f"❌ Missing permissions to delete messages in {channel.name} ({label})")
+        except discord.HTTPException as e:
+            log.warning(f"⚠️ Failed to clear messages in {channel.name} ({label}): {e}")
 
-async def update_leaderboards():
-    """Completely clears the leaderboard channels and posts the latest leaderboard."""
-    await bot.wait_until_ready()
+    for page in pages:
+        await channel.send(page)
 
-    print("🔄 Updating leaderboards...")
+async def edit_in_place(board, channel, pages, label):
+    """Edits the board's pinned message(s) when the rendered content changed, posting and pinning any that are missing."""
+    content_hash = hashlib.sha256("\0".join(pages).encode()).hexdigest()
+    record = bot.leaderboard_messages.get(board)
+    if record and record["channel_id"] == channel.id and record["content_hash"] == content_hash:
+        log.debug(f"⏭️ Leaderboard content unchanged for {label}")
+        return
 
-    # 🔹 Update Campaign Leaderboards
-    for guild_id, channel_id in CAMPAIGN_LEADERBOARD_CHANNELS.items():
-        guild = bot.get_guild(guild_id)
-        if guild:
-            channel = bot.get_channel(channel_id)
-            if channel:
-                try:
-                    # ✅ Purge entire channel history
-                    await channel.purge()
-                    print(f"✅ Cleared all messages in {channel.name} ({guild.name})")
-                except discord.Forbidden:
-                    print(f"❌ Missing permissions to delete messages in {channel.name} ({guild.name})")
-                except discord.HTTPException as e:
-                    print(f"⚠️ Failed to clear messages in {channel.name} ({guild.name}): {e}")
-
-                # Get videos for this campaign
-                campaign_videos = [
-                    video for video in bot.video_submissions.values() if video["server_id"] == guild_id
-                ]
-                if campaign_videos:
-                    campaign_videos.sort(key=lambda v: v["latest_views"], reverse=True)
-                    response = f"**📊 {guild.name} Leaderboard (Top Videos):**\n\n"
-                    for i, vid in enumerate(campaign_videos[:10], start=1):  # Limit to top 10
-                        response += f"**#{i}** - [{vid['video_url']}]({vid['video_url']}) on **{vid['platform'].capitalize()}** - **{vid['latest_views']} Views**\n"
-
-                    await channel.send(response)
-                    print(f"✅ Leaderboard updated for {guild.name}")
-
-    # 🔹 Update Global Leaderboard in Main Server
-    global_channel = bot.get_channel(GLOBAL_LEADERBOARD_CHANNEL_ID)
-    if global_channel:
+    message_ids = json.loads(record["message_ids"]) if record and record["channel_id"] == channel.id else []
+    new_message_ids = []
+    for index, page in enumerate(pages):
+        message = None
+        if index < len(message_ids):
+            try:
+                message = await channel.get_partial_message(message_ids[index]).edit(content=page)
+            except discord.NotFound:
+                message = None  # Deleted by someone; post a replacement below
+        if message is None:
+            message = await channel.send(page)
+            try:
+                await message.pin()
+            except discord.HTTPException as e:
+                log.warning(f"⚠️ Couldn't pin leaderboard message for {label}: {e}")
+        new_message_ids.append(message.id)
+
+    # The board shrank: remove pages that are no longer needed
+    for message_id in message_ids[len(pages):]:
         try:
-            # ✅ Purge entire global leaderboard channel
-            await global_channel.purge()
-            print("✅ Cleared all messages in the global leaderboard channel")
-        except discord.Forbidden:
-            print("❌ Missing permissions to delete messages in the global leaderboard channel.")
-        except discord.HTTPException as e:
-            print(f"⚠️ Failed to clear messages in the global leaderboard channel: {e}")
+            await channel.get_partial_message(message_id).delete()
+        except discord.NotFound:
+            pass
+
+    bot.leaderboard_messages[board] = {
+        "channel_id": channel.id,
+        "message_ids": json.dumps(new_message_ids),
+        "content_hash": content_hash,
+    }
+    storage.upsert("leaderboard_messages", board, bot.leaderboard_messages[board])
+
+async def post_leaderboard(board, channel, pages, label):
+    async with bot.channel_locks.setdefault(channel.id, asyncio.Lock()):
+        if LEADERBOARD_MODE == "purge":
+            await purge_and_post(channel, pages, label)
+        else:
+            await edit_in_place(board, channel, pages, label)
+
+async def publish_campaign_leaderboard(guild_id, channel_id):
+    channel = leaderboard_channel(channel_id)
+
+    # Get the top videos for this campaign
+    campaign_videos = bot.video_submissions.top(LEADERBOARD_SIZE, guild_id)
+    guild = bot.get_guild(guild_id)  # None when the guild is on another shard process
+    campaign_name = guild.name if guild else next((vid.server_name for vid in campaign_videos), str(guild_id))
+    snapshot = leaderboard_snapshot(campaign_videos)
+    if bot.rendered_leaderboards.get(guild_id) == snapshot:
+        log.debug(f"⏭️ Leaderboard unchanged for {campaign_name}")
+        return
+
+    lines = [
+        f"**#{i}** - [{vid.video_url}]({vid.video_url}) on **{vid.platform.capitalize()}** - **{vid.latest_views} Views**\n"
+        for i, vid in enumerate(campaign_videos, start=1)
+    ] or ["No videos submitted yet.\n"]
+    pages = render_leaderboard_pages(f"**📊 {campaign_name} Leaderboard (Top Videos):**\n\n", lines)
 
-        all_videos = sorted(bot.video_submissions.values(), key=lambda v: v["latest_views"], reverse=True)
-        if all_videos:
-            response = "**🌎 Global Leaderboard (Top Videos Across All Campaigns):**\n\n"
-            for i, vid in enumerate(all_videos[:10], start=1):  # Limit to top 10
-                response += f"**#{i}** - [{vid['video_url']}]({vid['video_url']}) on **{vid['platform'].capitalize()}** - **{vid['latest_views']} Views**\n"
-                response += f"🎯 Campaign: **{vid['server_name']}**\n"
+    await post_leaderboard(str(guild_id), channel, pages, campaign_name)
+    bot.rendered_leaderboards[guild_id] = snapshot
+    log.info(f"✅ Leaderboard updated for {campaign_name}")
 
-            await global_channel.send(response)
-            print("✅ Global leaderboard updated!")
+async def publish_global_leaderboard():
+    global_channel = leaderboard_channel(GLOBAL_LEADERBOARD_CHANNEL_ID)
 
-    print("✅ Leaderboard update complete!")
+    all_videos = bot.video_submissions.top(LEADERBOARD_SIZE)
+    snapshot = leaderboard_snapshot(all_videos)
+    if bot.rendered_leaderboards.get("global") == snapshot:
+        log.debug("⏭️ Global leaderboard unchanged")
+        return
 
+    lines = [
+        f"**#{i}** - [{vid.video_url}]({vid.video_url}) on **{vid.platform.capitalize()}** - **{vid.latest_views} Views**\n"
+        f"🎯 Campaign: **{vid.server_name}**\n"
+        for i, vid in enumerate(all_videos, start=1)
+    ] or ["No videos submitted yet.\n"]
+    pages = render_leaderboard_pages("**🌎 Global Leaderboard (Top Videos Across All Campaigns):**\n\n", lines)
+
+    await post_leaderboard("global", global_channel, pages, "global leaderboard")
+    bot.rendered_leaderboards["global"] = snapshot
+    log.info("✅ Global leaderboard updated!")
+
+async def timed_publish(board, publish, semaphore):
+    """Runs one board's publish under the shared semaphore, isolating its failures and recording how long it took."""
+    async with semaphore:
+        started = time.perf_counter()
+        try:
+            await publish()
+            return True
+        except Exception as e:
+            log.error(f"❌ Failed to update leaderboard {board}: {e}")
+            return False
+        finally:
+            elapsed = time.perf_counter() - started
+            bot.leaderboard_timings[board] = elapsed
+            metrics.observe("mayorbot_leaderboard_publish_seconds", elapsed, board=board)
+            if elapsed > LEADERBOARD_SLOW_SECONDS:
+                log.warning(f"🐢 Leaderboard {board} took {elapsed:.1f}s to publish")
 
+async def update_leaderboards():
+    """Publishes every campaign leaderboard and the global one concurrently, skipping boards whose top videos didn't change."""
+    log.info("🔄 Updating leaderboards...")
+
+    # Each board edits its own channel (its own discord.py rate-limit bucket); the semaphore
+    # keeps the total in flight well under Discord's global request limit.
+    semaphore = asyncio.Semaphore(LEADERBOARD_PUBLISH_CONCURRENCY)
+    results = await asyncio.gather(
+        *(
+            timed_publish(str(guild_id), lambda g=guild_id, c=channel_id: publish_campaign_leaderboard(g, c), semaphore)
+            for guild_id, channel_id in CAMPAIGN_LEADERBOARD_CHANNELS.items()
+        ),
+        timed_publish("global", publish_global_leaderboard, semaphore),
+    )
+
+    failed = results.count(False)
+    if failed:
+        log.warning(f"⚠️ Leaderboard update finished with {failed} failed board(s).")
+    else:
+        log.info("✅ Leaderboard update complete!")
 
-    await asyncio.sleep(3600)  # Update every hour
 
-    bot.loop.create_task(update_leaderboards())
-        
 #📌 Add /forceupdate Command to Manually Update Leaderboards
 
 @bot.tree.command(name="forceupdate", description="Manually update the leaderboard (Admin Only).")
@@ -385,10 +2675,181 @@ async def forceupdate(interaction: discord.Interaction):
         await interaction.response.send_message("❌ You do not have permission to use this command.", ephemeral=True)
         return
 
-    # Run the leaderboard update function
-    await update_leaderboards()
+    # Leaderboards are published by the leader process; a follower shard asks it through the shared store
+    if not bot.is_leader:
+        storage.upsert("job_triggers", "leaderboards", {"requested_at": time.time()})
+        await interaction.response.send_message("✅ Leaderboard update requested; the leader shard will start it within a few seconds.", ephemeral=True)
+        return
+
+    # Hand the update to the scheduler so this interaction answers right away
+    if scheduler.trigger("leaderboards"):
+        await interaction.response.send_message("⏳ A leaderboard update is already running; another will start when it finishes.", ephemeral=True)
+    else:
+        await interaction.response.send_message("✅ Leaderboard update started!", ephemeral=True)
 
-    await interaction.response.send_message("✅ Leaderboards updated!", ephemeral=True)
+
+#📌 Add /jobs Command to Inspect Background Jobs
+
+@bot.tree.command(name="jobs", description="Show background job status (Admin Only).")
+async def jobs(interaction: discord.Interaction):
+    """Shows each scheduled job's last run duration, error and run counts."""
+    if not interaction.user.guild_permissions.administrator:
+        await interaction.response.send_message("❌ You do not have permission to use this command.", ephemeral=True)
+        return
+
+    role = "👑 leader" if bot.is_leader else "follower"
+    shards = f", shards {sorted(bot.shards)} of {bot.shard_count}" if bot.shard_count else ""
+    lines = [f"**⚙️ Background Jobs** (`{bot.instance_id}`, {role}{shards}):"]
+    for job in scheduler.jobs.values():
+        status = "🟢 running" if job.running else "⚪ idle"
+        if job.leader_only and not bot.is_leader:
+            status = "⏸️ on leader"
+        duration = f"{job.last_duration:.2f}s" if job.last_duration is not None else "never run"
+        next_run = f"<t:{int(job.next_run)}:R>" if job.next_run else "pending"
+        lines.append(
+            f"**{job.name}** - {status} - last run {duration} - next {next_run} - "
+            f"{job.runs} run(s), {job.failures} failure(s)"
+        )
+        if job.last_error:
+            lines.append(f"  ↳ ⚠️ Last error: `{job.last_error[:200]}`")
+
+    queue = work_queue.stats()
+    lines.append(
+        f"**📥 Work queue:** {queue['depth']}/{queue['max_depth']} queued - {queue['processed']} processed, "
+        f"{queue['failed']} failed, {queue['rejected']} rejected - wait avg {queue['wait_avg']:.2f}s, p95 {queue['wait_p95']:.2f}s"
+    )
+
+    for provider, breaker in platform_client.breakers.items():
+        budget = platform_client.budgets[provider]
+        quota = f"{budget.used}/{budget.daily_limit}" if budget.daily_limit else f"{budget.used}/unlimited"
+        lines.append(f"**🌐 {provider}:** circuit {breaker.state} ({breaker.failures} recent failure(s)) - quota {quota} today")
+
+    slowest = sorted(bot.leaderboard_timings.items(), key=lambda item: item[1], reverse=True)[:5]
+    if slowest:
+        lines.append("**🐢 Slowest leaderboards (last publish):** " + ", ".join(f"`{board}` {seconds:.2f}s" for board, seconds in slowest))
+
+    await interaction.response.send_message("\n".join(lines), ephemeral=True)
+
+
+#📌 Add /stats Command to Inspect Latency, API Health and Caches
+
+@metrics.collector
+def collect_runtime_metrics():
+    """Copies state that other components already track into gauges just before a scrape or /stats."""
+    for name, cache in (("view", view_cache), ("bio", bio_cache)):
+        stats = cache.stats()
+        metrics.set("mayorbot_cache_hits_total", stats["hits"] + stats["coalesced"], cache=name)
+        metrics.set("mayorbot_cache_misses_total", stats["misses"], cache=name)
+        metrics.set("mayorbot_cache_hit_ratio", round(stats["hit_ratio"], 4), cache=name)
+        metrics.set("mayorbot_cache_entries", stats["size"], cache=name)
+    for provider, breaker in platform_client.breakers.items():
+        metrics.set("mayorbot_provider_circuit_open", int(breaker.state != "closed"), provider=provider)
+        metrics.set("mayorbot_provider_quota_used", platform_client.budgets[provider].used, provider=provider)
+    for job in scheduler.jobs.values():
+        if job.last_duration is not None:
+            metrics.set("mayorbot_job_last_duration_seconds", round(job.last_duration, 4), job=job.name)
+        metrics.set("mayorbot_job_failures_total", job.failures, job=job.name)
+    metrics.set("mayorbot_work_queue_depth", work_queue.queue.qsize())
+
+
+def format_seconds(seconds):
+    return f"{seconds * 1000:.0f}ms" if seconds < 1 else f"{seconds:.2f}s"
+
+
+@bot.tree.command(name="stats", description="Show command latency, API health and cache metrics (Admin Only).")
+@app_commands.describe(profiling="Start or stop the sampling profiler")
+@app_commands.choices(profiling=[
+    app_commands.Choice(name="Start", value="start"),
+    app_commands.Choice(name="Stop", value="stop"),
+])
+async def stats(interaction: discord.Interaction, profiling: str = None):
+    """Summarizes the metrics registry; the full set is on the /metrics endpoint."""
+    if not interaction.user.guild_permissions.administrator:
+        await interaction.response.send_message("❌ You do not have permission to use this command.", ephemeral=True)
+        return
+
+    if profiling == "start":
+        profiler.start()
+    elif profiling == "stop":
+        profiler.stop()
+    metrics.collect()
+
+    lines = ["**📈 Commands** (p50 / p95, count, errors):"]
+    errors = {labels["command"]: value for labels, value in metrics.series(metrics.counters, "mayorbot_command_errors_total")}
+    commands_seen = sorted(metrics.series(metrics.histograms, "mayorbot_command_seconds"), key=lambda item: -item[1].count)
+    for labels, histogram in commands_seen:
+        command = labels["command"]
+        lines.append(
+            f"`/{command}` {format_seconds(histogram.quantile(0.5))} / {format_seconds(histogram.quantile(0.95))}, "
+            f"{histogram.count} run(s), {errors.get(command, 0)} error(s)"
+        )
+    if not commands_seen:
+        lines.append("No commands run yet.")
+
+    lines.append("**🌐 Platform APIs:**")
+    requests = {}
+    for labels, value in metrics.series(metrics.counters, "mayorbot_provider_requests_total"):
+        totals = requests.setdefault(labels["provider"], [0, 0])
+        totals[0] += value
+        totals[1] += value if labels["status"] != 200 else 0
+    for labels, histogram in metrics.series(metrics.histograms, "mayorbot_provider_request_seconds"):
+        total, failed = requests.get(labels["provider"], (0, 0))
+        lines.append(
+            f"`{labels['provider']}` {total} request(s), {failed / total if total else 0:.1%} errors - "
+            f"avg {format_seconds(histogram.sum / histogram.count)}, p95 {format_seconds(histogram.quantile(0.95))}"
+        )
+    for labels, value in metrics.series(metrics.counters, "mayorbot_provider_rejected_total"):
+        lines.append(f"`{labels['provider']}` {value} request(s) refused locally ({labels['reason']})")
+
+    ratios = ", ".join(f"{labels['cache']} {value:.0%}" for labels, value in metrics.series(metrics.gauges, "mayorbot_cache_hit_ratio"))
+    lines.append(f"**🗃️ Cache hit ratio:** {ratios}")
+
+    lag = metrics.histograms.get(("mayorbot_event_loop_lag_seconds", ()))
+    if lag:
+        lines.append(f"**⏱️ Event-loop lag:** p50 {format_seconds(lag.quantile(0.5))}, p99 {format_seconds(lag.quantile(0.99))}, max {format_seconds(lag.max)}")
+
+    boards = [histogram for _, histogram in metrics.series(metrics.histograms, "mayorbot_leaderboard_publish_seconds")]
+    if boards:
+        slowest = max(boards, key=lambda histogram: histogram.max)
+        lines.append(f"**🏆 Leaderboard publishes:** {sum(h.count for h in boards)} - slowest {format_seconds(slowest.max)}")
+
+    if profiler.running or profiler.samples:
+        state = "running" if profiler.running else "stopped"
+        hottest = ", ".join(f"`{function}` {share:.0%}" for function, share in profiler.hottest())
+        lines.append(f"**🔬 Profiler ({state}, {profiler.samples} samples):** {hottest or 'no samples yet'}")
+
+    await interaction.response.send_message("\n".join(lines)[:DISCORD_MESSAGE_LIMIT], ephemeral=True)
+
+
+#📌 Payout Settings
+
+# 🔹 Define Payout Per Campaign (Guild ID -> settings); anything not set falls back to DEFAULT_PAYOUT
+DEFAULT_PAYOUT = {
+    "rate": 0.001,  # Dollars per view
+    "cap": None,  # Max payout per user per campaign (None = no cap)
+    "min_views": 0,  # Users below this many total views aren't paid yet
+}
+CAMPAIGN_PAYOUTS = {
+    123456789012345678: {"rate": 0.002},  # Example: Campaign 1 pays $0.002 per view
+    234567890123456789: {"rate": 0.005, "cap": 500, "min_views": 10000},  # Example: Campaign 2 pays $0.005 per view
+}
+
+# Optional JSON file ({"<guild id>": {"rate": ..., "cap": ..., "min_views": ...}}) overriding the table above
+if os.getenv("CAMPAIGN_PAYOUTS_FILE"):
+    with open(os.getenv("CAMPAIGN_PAYOUTS_FILE")) as payouts_file:
+        CAMPAIGN_PAYOUTS.update({int(guild_id): settings for guild_id, settings in json.load(payouts_file).items()})
+
+def payout_settings(campaign_id):
+    return {**DEFAULT_PAYOUT, **CAMPAIGN_PAYOUTS.get(campaign_id, {})}
+
+def compute_payout(views, settings):
+    """Applies a campaign's rate, minimum-views threshold and cap to a user's total views."""
+    if views < settings["min_views"]:
+        return 0.0
+    amount = views * settings["rate"]
+    if settings["cap"] is not None:
+        amount = min(amount, settings["cap"])
+    return round(amount, 2)
 
 
 #📌 Add /requestpayout Command to Open Tickets
@@ -398,23 +2859,22 @@ async def requestpayout(interaction: discord.Interaction):
     """Opens a private payout ticket for Admins & Server Team to review."""
     
     user_id = interaction.user.id
-    if user_id not in bot.video_submissions:
-        await interaction.response.send_message("❌ You haven’t submitted any videos yet.", ephemeral=True)
+    videos = bot.video_submissions.for_user(user_id, interaction.guild.id)
+    if not videos:
+        await interaction.response.send_message("❌ You haven’t submitted any videos in this campaign yet.", ephemeral=True)
         return
 
-    video = bot.video_submissions[user_id]
-    campaign_id = video["server_id"]
-    views = video["latest_views"]
-
-    # 🔹 Define Payout Per Campaign
-    CAMPAIGN_PAYOUTS = {
-        123456789012345678: 0.002,  # Example: Campaign 1 pays $0.002 per view
-        234567890123456789: 0.005,  # Example: Campaign 2 pays $0.005 per view
-    }
-    payout_rate = CAMPAIGN_PAYOUTS.get(campaign_id, 0.001)  # Default rate
+    campaign_id = interaction.guild.id
+    views = sum(video.latest_views for video in videos)
 
     # 🔹 Calculate payout amount
-    payout_amount = round(views * payout_rate, 2)
+    settings = payout_settings(campaign_id)
+    if views < settings["min_views"]:
+        await interaction.response.send_message(
+            f"❌ This campaign pays out from **{settings['min_views']}** views; you have **{views}** so far.", ephemeral=True
+        )
+        return
+    payout_amount = compute_payout(views, settings)
 
     # 🔹 Check if a ticket already exists for this user
     guild = interaction.guild
@@ -436,12 +2896,12 @@ async def requestpayout(interaction: discord.Interaction):
     if server_team_role:  # ✅ Only add if role exists
         overwrites[server_team_role] = discord.PermissionOverwrite(view_channel=True, send_messages=True)
     else:
-        print("⚠️ Warning: 'server team' role not found. Skipping role permissions.")
+        log.warning("⚠️ Warning: 'server team' role not found. Skipping role permissions.")
 
     if admin_role:  # ✅ Only add if role exists
         overwrites[admin_role] = discord.PermissionOverwrite(view_channel=True, send_messages=True)
     else:
-        print("⚠️ Warning: 'admin' role not found. Skipping role permissions.")
+        log.warning("⚠️ Warning: 'admin' role not found. Skipping role permissions.")
 
     # 🔹 Create a private channel for the payout request
     try:
@@ -450,15 +2910,13 @@ async def requestpayout(interaction: discord.Interaction):
         await interaction.response.send_message("❌ Bot lacks permission to create channels.", ephemeral=True)
         return
     except Exception as e:
-        print(f"❌ Error creating ticket channel: {e}")
+        log.error(f"❌ Error creating ticket channel: {e}")
         await interaction.response.send_message("❌ An error occurred while creating your payout ticket.", ephemeral=True)
         return
 
     # 🔹 Store pending payout request
-    if not hasattr(bot, "pending_payouts"):
-        bot.pending_payouts = {}
-
     bot.pending_payouts[user_id] = {
+        "guild_id": guild.id,
         "username": interaction.user.name,
         "campaign": guild.name,
         "views": views,
@@ -466,6 +2924,7 @@ async def requestpayout(interaction: discord.Interaction):
         "status": "Pending",
         "channel_id": ticket_channel.id
     }
+    storage.upsert("pending_payouts", user_id, bot.pending_payouts[user_id])
 
     # 🔹 Send payout details in the ticket channel
     await ticket_channel.send(
@@ -484,5 +2943,121 @@ async def requestpayout(interaction: discord.Interaction):
      
 
 
+#📌 Add /bulkpayout Command to Export a Whole Campaign's Payouts
+
+PAYOUT_EXPORT_COLUMNS = ("user_id", "username", "videos", "views", "rate", "amount", "eligible")
+
+def compute_campaign_payouts(campaign_id, guild=None):
+    """Computes every user's payout for a campaign in one pass over the campaign index."""
+    settings = payout_settings(campaign_id)
+
+    # 🔹 Sum views per user (single pass over this campaign's submissions)
+    views_by_user = {}
+    videos_by_user = {}
+    for video in bot.video_submissions.for_guild(campaign_id):
+        views_by_user[video.user_id] = views_by_user.get(video.user_id, 0) + video.latest_views
+        videos_by_user[video.user_id] = videos_by_user.get(video.user_id, 0) + 1
+
+    rows = []
+    for user_id, views in views_by_user.items():
+        member = guild.get_member(user_id) if guild else None
+        amount = compute_payout(views, settings)
+        rows.append((
+            user_id, member.name if member else "", videos_by_user[user_id], views,
+            settings["rate"], amount, views >= settings["min_views"],
+        ))
+    rows.sort(key=lambda row: row[5], reverse=True)
+    return rows
+
+def write_payout_export(rows, export_format):
+    """Serializes payout rows as CSV or JSON Lines into an in-memory file."""
+    buffer = io.StringIO()
+    if export_format == "csv":
+        writer = csv.writer(buffer)
+        writer.writerow(PAYOUT_EXPORT_COLUMNS)
+        writer.writerows(rows)
+    else:
+        for row in rows:
+            buffer.write(json.dumps(dict(zip(PAYOUT_EXPORT_COLUMNS, row))) + "\n")
+    return io.BytesIO(buffer.getvalue().encode())
+
+@bot.tree.command(name="bulkpayout", description="Export payouts for every user in this campaign (Admin Only).")
+@app_commands.describe(export_format="File format for the payout report")
+@app_commands.choices(export_format=[
+    app_commands.Choice(name="CSV", value="csv"),
+    app_commands.Choice(name="JSON Lines", value="jsonl"),
+])
+async def bulkpayout(interaction: discord.Interaction, export_format: str = "csv"):
+    """Computes payouts for the whole campaign and sends them as a file attachment."""
+    if not interaction.user.guild_permissions.administrator:
+        await interaction.response.send_message("❌ You do not have permission to use this command.", ephemeral=True)
+        return
+
+    guild = interaction.guild
+    rows = compute_campaign_payouts(guild.id, guild)
+    if not rows:
+        await interaction.response.send_message("❌ No video submissions found for this campaign.", ephemeral=True)
+        return
+
+    await interaction.response.defer(ephemeral=True, thinking=True)
+
+    # Serializing 100k rows takes a moment, so keep it off the event loop
+    export = await asyncio.to_thread(write_payout_export, rows, export_format)
+    eligible = [row for row in rows if row[6]]
+    total = round(sum(row[5] for row in eligible), 2)
+
+    await interaction.followup.send(
+        f"💰 **{guild.name} payouts:** {len(eligible)}/{len(rows)} user(s) eligible - total **${total}**",
+        file=discord.File(export, filename=f"payouts-{guild.id}-{int(time.time())}.{export_format}"),
+        ephemeral=True,
+    )
+
+
+# ✅ Scheduled Jobs
+DELETION_RETENTION = 24 * 3600  # Seconds sync tombstones are kept for processes that fell behind
+
+async def cleanup():
+    """Drops expired cache entries, stale moderation cooldowns and leaderboard messages for boards that are no longer configured."""
+    expired = view_cache.purge_expired() + bio_cache.purge_expired()
+    moderation.prune_warnings()
+
+    if bot.is_leader:  # Leaderboard messages and sync tombstones are shared; one process tidies them
+        boards = {str(guild_id) for guild_id in CAMPAIGN_LEADERBOARD_CHANNELS} | {"global"}
+        for board in [board for board in bot.leaderboard_messages if board not in boards]:
+            del bot.leaderboard_messages[board]
+            storage.delete("leaderboard_messages", board)
+        await storage.prune_deletions(time.time() - DELETION_RETENTION)
+
+    log.info(f"🧹 Cleanup removed {expired} expired cache entries.")
+
+scheduler.add("leaderboards", update_leaderboards, LEADERBOARD_INTERVAL, leader_only=True)
+scheduler.add("view_refresh", refresh_views, VIEW_REFRESH_TICK, leader_only=True)
+scheduler.add("cleanup", cleanup, CLEANUP_INTERVAL)
+scheduler.add("moderation", moderation.flush, MODERATION_FLUSH_INTERVAL, jitter=0)
+scheduler.add("history_downsample", downsample_history, HISTORY_DOWNSAMPLE_INTERVAL, leader_only=True)
+scheduler.add("leader_election", elect_leader, LEASE_RENEW_INTERVAL, jitter=0, wait_for_ready=False)
+scheduler.add("storage_sync", sync_from_storage, SYNC_INTERVAL, jitter=0, wait_for_ready=False)
+
+
+async def main():
+    """Starts the bot, then stops background work, closes the shared HTTP session and flushes storage on shutdown."""
+    async with bot:
+        try:
+            await bot.start(TOKEN)
+        finally:
+            await scheduler.stop()
+            await work_queue.stop()
+            await stop_metrics()
+            if bot.is_leader and storage.conn is not None:
+                await storage.release_lease("leader", bot.instance_id)  # Lets another shard take over straight away
+            await platform_client.close()
+            await storage.close()
+
+
 # Run the bot
-bot.run(TOKEN)
+if __name__ == "__main__":
+    discord.utils.setup_logging(
+        level=getattr(logging, LOG_LEVEL, logging.INFO),
+        formatter=JsonLogFormatter() if LOG_FORMAT == "json" else discord.utils.MISSING,
+    )
+    asyncio.run(main())
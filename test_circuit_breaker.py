@@ -0,0 +1,124 @@
+"""Checks for the per-provider CircuitBreaker and how PlatformClient.get_json drives it."""
+import asyncio
+import time
+
+import pytest
+
+import bot
+from bot import CircuitBreaker, CircuitOpenError, PlatformClient, PlatformError
+
+
+class FakeTime:
+    """Stands in for the time module inside bot only, so the event loop keeps the real clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeTime()
+    monkeypatch.setattr(bot, "time", fake)
+    return fake
+
+
+def test_opens_after_threshold_and_fails_fast(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+
+def test_one_probe_after_cool_down(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    clock.now += 60
+    assert breaker.allow()  # The probe
+    assert breaker.state == "half_open"
+    assert not breaker.allow()  # Everyone else still fails fast
+
+    breaker.record_failure()  # Probe failed: straight back to open
+    assert breaker.state == "open" and not breaker.allow()
+    clock.now += 60
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_probe_that_never_reports_back_does_not_wedge_half_open(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    clock.now += 60
+    assert breaker.allow()  # Probe lost: no success or failure is ever recorded
+    clock.now += 59
+    assert not breaker.allow()
+    clock.now += 1
+    assert breaker.allow()  # The next caller becomes the probe
+
+
+def client_with(responses):
+    """A PlatformClient for provider "p" whose requests pop results (or exceptions to raise) from `responses`."""
+    client = PlatformClient(max_retries=0, quotas={"p": 0})
+    client.breakers["p"] = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+
+    async def get_once(url, params, headers, timeout, provider):
+        result = responses.pop(0)
+        if isinstance(result, BaseException):
+            raise result
+        if asyncio.iscoroutine(result):
+            return await result
+        return result
+
+    client._get_once = get_once
+    return client
+
+
+def test_get_json_opens_on_server_errors_but_not_client_errors(clock):
+    client = client_with([PlatformError(404, "gone"), PlatformError(500, "x"), PlatformError(500, "x")])
+    breaker = client.breakers["p"]
+    for _ in range(3):
+        with pytest.raises(PlatformError):
+            asyncio.run(client.get_json("u", provider="p"))
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(client.get_json("u", provider="p"))
+
+
+def test_get_json_reopens_when_the_probe_is_cancelled(clock):
+    client = client_with([PlatformError(500, "x"), PlatformError(500, "x"), asyncio.sleep(10), {"ok": True}])
+    breaker = client.breakers["p"]
+    for _ in range(2):
+        with pytest.raises(PlatformError):
+            asyncio.run(client.get_json("u", provider="p"))
+    clock.now += 60
+
+    async def cancelled_probe():
+        probe = asyncio.ensure_future(client.get_json("u", provider="p"))
+        await asyncio.sleep(0)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+    asyncio.run(cancelled_probe())
+    assert breaker.state == "open"
+    clock.now += 60
+    assert asyncio.run(client.get_json("u", provider="p")) == {"ok": True}
+    assert breaker.state == "closed"
@@ -0,0 +1,62 @@
+"""Property checks for the bounded Leaderboard against a plain full sort."""
+import random
+
+import pytest
+
+from bot import Leaderboard
+
+
+def expected_top(views, k):
+    return [submission_id for _, submission_id in sorted((-count, submission_id) for submission_id, count in views.items())[:k]]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_top_matches_full_sort_under_random_updates_and_removals(seed):
+    rng = random.Random(seed)
+    board = Leaderboard(capacity=20)
+    views = {}
+    for step in range(20000):
+        submission_id = rng.randrange(300)
+        if rng.random() < 0.05:
+            board.remove(submission_id)
+            views.pop(submission_id, None)
+        else:
+            count = rng.randrange(1000)
+            board.update(submission_id, count)
+            views[submission_id] = count
+        if step % 97 == 0:
+            k = rng.choice([1, 10, 20, 50])  # 50 is past capacity, which falls back to a full scan
+            assert board.top(k) == expected_top(views, k)
+            assert len(board) == len(views)
+
+
+def test_entry_falling_out_of_the_top_is_replaced_by_the_best_of_the_rest():
+    board = Leaderboard(capacity=3)
+    for submission_id, count in enumerate([50, 40, 30, 20, 10]):
+        board.update(submission_id, count)
+    assert board.top(3) == [0, 1, 2]
+
+    board.update(0, 5)  # Drops below everything outside the top
+    assert board.top(3) == [1, 2, 3]
+
+    board.remove(1)
+    assert board.top(3) == [2, 3, 4]
+
+
+def test_fewer_submissions_than_capacity():
+    board = Leaderboard(capacity=10)
+    board.update(1, 5)
+    board.update(2, 7)
+    board.update(1, 9)
+    assert board.top(10) == [1, 2]
+    board.remove(1)
+    assert board.top(10) == [2]
+    board.remove(2)
+    assert board.top(10) == [] and len(board) == 0
+
+
+def test_equal_views_rank_by_submission_id():
+    board = Leaderboard(capacity=2)
+    for submission_id in (3, 1, 2):
+        board.update(submission_id, 100)
+    assert board.top(3) == [1, 2, 3]
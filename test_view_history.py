@@ -0,0 +1,106 @@
+"""Checks for ViewHistory sampling, downsampling and the cross-shard merge."""
+import random
+
+import pytest
+
+from bot import HISTORY_HOURLY_WINDOW, HISTORY_RAW_WINDOW, ViewHistory, merge_history_rows
+
+NOW = 1_800_000_000
+
+
+def history(samples):
+    result = ViewHistory()
+    for timestamp, views in samples:
+        result.append(timestamp, views)
+    return result
+
+
+def samples(history):
+    return list(zip(history.times, history.views))
+
+
+def dense_samples(days=10, step=600, seed=0):
+    rng = random.Random(seed)
+    views = 0
+    result = []
+    for timestamp in range(NOW - days * 86400, NOW, step):
+        views += rng.randrange(100)
+        result.append((timestamp, views))
+    return result
+
+
+def test_append_keeps_the_newer_count_for_the_same_second():
+    h = history([(100, 1), (100, 5), (90, 7), (200, 9)])
+    assert samples(h) == [(100, 7), (200, 9)]
+
+
+def test_views_at_and_growth():
+    h = history([(0, 0), (3600, 100), (7200, 300)])
+    assert h.views_at(-10) == 0  # Before the first sample
+    assert h.views_at(5000) == 100
+    assert h.growth(3600, 7200) == pytest.approx(200)
+    assert h.growth(7200, 7200) == pytest.approx(150)
+    assert history([(0, 5)]).growth(3600, 0) == 0.0
+
+
+def test_downsample_keeps_raw_recent_then_hourly_then_daily():
+    h = history(dense_samples())
+    original = samples(h)
+    assert h.downsample(NOW)
+    kept = samples(h)
+
+    assert kept[0] == original[0]  # The first sample is always kept
+    assert [s for s in original if s[0] >= NOW - HISTORY_RAW_WINDOW] == [s for s in kept if s[0] >= NOW - HISTORY_RAW_WINDOW]
+    hourly = [t for t, _ in kept[1:] if NOW - HISTORY_HOURLY_WINDOW <= t < NOW - HISTORY_RAW_WINDOW]
+    daily = [t for t, _ in kept[1:] if t < NOW - HISTORY_HOURLY_WINDOW]
+    assert len({t // 3600 for t in hourly}) == len(hourly)
+    assert len({t // 86400 for t in daily}) == len(daily)
+    assert set(kept) <= set(original)
+    assert not h.downsample(NOW)  # Already thinned
+
+
+def test_merge_takes_the_union_of_samples():
+    ours = history([(NOW - 40, 1), (NOW - 20, 3)])
+    theirs = history([(NOW - 40, 1), (NOW - 30, 2), (NOW - 10, 4)])
+    ours.merge(theirs, NOW)
+    assert samples(ours) == [(NOW - 40, 1), (NOW - 30, 2), (NOW - 20, 3), (NOW - 10, 4)]
+
+
+def test_merge_fast_paths():
+    ours = history([(10, 1), (20, 2)])
+    ours.merge(history([(10, 1)]), NOW)  # Nothing new
+    assert samples(ours) == [(10, 1), (20, 2)]
+    ours.merge(history([(10, 1), (20, 2), (30, 3)]), NOW)  # Theirs only has newer polls
+    assert samples(ours) == [(10, 1), (20, 2), (30, 3)]
+
+
+def test_merge_does_not_undo_downsampling():
+    dense = history(dense_samples())
+    thinned = history(dense_samples())
+    thinned.downsample(NOW)
+    expected = samples(thinned)
+
+    thinned.merge(dense, NOW)
+    assert samples(thinned) == expected
+    dense.merge(history(expected), NOW)
+    assert samples(dense) == expected
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_merge_is_order_independent(seed):
+    rng = random.Random(seed)
+    base = dense_samples(days=2, step=900, seed=seed)
+    a = history(sorted(rng.sample(base, len(base) // 2)))
+    b = history(sorted(rng.sample(base, len(base) // 2)))
+    a_then_b = history(samples(a))
+    a_then_b.merge(b, NOW)
+    b_then_a = history(samples(b))
+    b_then_a.merge(a, NOW)
+    assert samples(a_then_b) == samples(b_then_a)
+
+
+def test_merge_history_rows_combines_stored_and_written_rows():
+    stored = history([(NOW - 20, 1), (NOW - 10, 2)]).as_row()
+    written = history([(NOW - 20, 1), (NOW - 5, 3)]).as_row()
+    times, views = merge_history_rows((stored["times"], stored["views"]), (written["times"], written["views"]))
+    assert samples(ViewHistory(times, views)) == [(NOW - 20, 1), (NOW - 10, 2), (NOW - 5, 3)]